@@ -4,9 +4,10 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
 
 from app.core.config import get_settings
+from app.core.principal import get_principal, get_user_role
 from app.core.security import verify_password
 from app.db.database import db
-from app.crud.crud import get_document_by_id, get_document_by_query
+from app.crud.crud import get_document_by_query
 from app.models.py_object_id import PyObjectId
 from app.models.token import TokenData
 from app.models.user import UserRead
@@ -14,13 +15,12 @@ from app.models.user import UserRead
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='users/login')
 
 users_collection = db.users
-roles_collection = db.roles
 
 async def authenticate_user(collection, username: str, password: str):
     user = await get_document_by_query({"username": username}, collection)
     if not user or not user["status"]:
         return False
-    if not verify_password(password, user["password"]):
+    if not await verify_password(password, user["password"]):
         return False
     return user
 
@@ -66,19 +66,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = await get_document_by_query(token_data.dict(), users_collection)
-    if user is None:
+    principal = await get_principal(token_data.username)
+    if principal is None:
         raise credentials_exception
+    user = dict(principal["user"])
     if not user["status"]:
         raise HTTPException(status_code=400, detail="Usuario Deshabilitado")
     return user
 
 async def validate_role(user: dict, allowd_roles: list[str] = []):
-    user_role = dict(await get_document_by_id(user["role"], roles_collection))["role"]
+    user_role = await get_user_role(user)
     if not user_role == "admin" and user_role not in allowd_roles:
         raise HTTPException(status_code=403, detail="El usuario no tiene los permisos suficientes para realizar la operación")
 
 async def validate_area_auth(user: dict, area_id: PyObjectId):
-    user_role = dict(await get_document_by_id(user["role"], roles_collection))["role"]
+    user_role = await get_user_role(user)
     if area_id not in user["areas"] and not user_role == "admin":
         raise HTTPException(status_code=403, detail="El usuario no tiene el permiso requerido para ejecutar esta acción")
\ No newline at end of file
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+import time
+
+class TTLCache:
+    """
+    Caché en memoria con tiempo de expiración y tamaño máximo. Al llenarse descarta el elemento usado hace más tiempo.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value)->None:
+        if self.maxsize <= 0:
+            return
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._items.pop(key, None)
+        return default if item is None else item[1]
+
+    def discard_where(self, predicate)->int:
+        """
+        Elimina los elementos para los que predicate(key, value) es verdadero. Retorna la cantidad eliminada.
+        """
+        keys = [key for key, (_, value) in self._items.items() if predicate(key, value)]
+        for key in keys:
+            del self._items[key]
+        return len(keys)
+
+    def clear(self)->None:
+        self._items.clear()
+
+    def __len__(self)->int:
+        return len(self._items)
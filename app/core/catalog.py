@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+from types import MappingProxyType
+
+from app.core.response_cache import invalidate_collections
+from app.db.database import db
+from app.models.py_object_id import PyObjectId
+
+# Colecciones pequeñas y casi estáticas que se sirven desde memoria.
+catalog_names = ("hazards", "ppes", "roles")
+
+class Catalog:
+    """
+    Copia inmutable en memoria de una colección, indexada por MongoID. Los documentos se comparten y no deben modificarse.
+    digest identifica el contenido del catálogo y es igual en todos los procesos que cargaron los mismos documentos.
+    """
+    __slots__ = ("name", "documents", "by_id", "digest")
+
+    def __init__(self, name: str, documents: list[dict]):
+        self.name = name
+        self.documents = tuple(documents)
+        self.by_id = MappingProxyType({document["_id"]: document for document in self.documents})
+        self.digest = hashlib.sha1(repr(self.documents).encode()).hexdigest()
+
+    def get(self, id: PyObjectId)->dict | None:
+        return self.by_id.get(id)
+
+    def get_many(self, ids: list)->dict:
+        """
+        Retorna un diccionario de la forma {id: documento} con los MongoID ingresados que existen en el catálogo.
+        """
+        return {id: self.by_id[id] for id in ids if id in self.by_id}
+
+catalogs: dict[str, Catalog] = {}
+catalogs_lock = asyncio.Lock()
+
+def is_cataloged(collection)->bool:
+    """
+    Indica si la colección se sirve desde el catálogo en memoria.
+    """
+    return collection.name in catalog_names
+
+async def load_catalog(name: str)->Catalog:
+    """
+    Lee la colección completa de la base de datos y reemplaza su catálogo.
+    """
+    documents = await db[name].find().sort("_id", 1).to_list(None)
+    catalogs[name] = Catalog(name, documents)
+    invalidate_collections(name)
+    return catalogs[name]
+
+async def load_catalogs()->dict:
+    """
+    Carga, o vuelve a cargar, todos los catálogos concurrentemente. Retorna la cantidad de documentos por catálogo.
+    """
+    async with catalogs_lock:
+        loaded = await asyncio.gather(*[load_catalog(name) for name in catalog_names])
+    return {catalog.name: len(catalog.documents) for catalog in loaded}
+
+async def get_catalog(name: str)->Catalog:
+    """
+    Obtiene el catálogo de la colección, cargándolo si aún no se ha cargado.
+    """
+    catalog = catalogs.get(name)
+    if catalog is None:
+        async with catalogs_lock:
+            catalog = catalogs.get(name) or await load_catalog(name)
+    return catalog
+
+def invalidate_catalog(name: str | None = None)->None:
+    """
+    Descarta el catálogo de la colección, o todos si no se ingresa una, para que se vuelva a cargar en el siguiente uso.
+    """
+    if name is None:
+        catalogs.clear()
+        return
+    catalogs.pop(name, None)
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from pydantic import BaseSettings
+from pydantic import BaseSettings, conint, validator
 
 class Settings(BaseSettings):
 
@@ -7,6 +7,43 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 120
     CONNECTION_STRING: str
+    MONGO_DATABASE: str = "ChemApp_DB"
+    MONGO_TLS: bool = True
+    STREAM_BATCH_SIZE: int = 100
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAXSIZE: int = 1024
+    HASHING_MAX_WORKERS: int = 2
+    HASHING_MAX_QUEUE: int = 64
+    BULK_CHUNK_SIZE: int = 500
+    USE_TRANSACTIONS: bool = False
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 10
+    MONGO_MAX_IDLE_TIME_MS: int | None = 300000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_COMPRESSORS: str = ""
+    MONGO_TIMEOUT_MS: int | None = 10000
+    FAST_JSON_RESPONSES: bool = False
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    RESPONSE_CACHE_MAXSIZE: int = 256
+    CHANGE_STREAMS_ENABLED: bool = True
+    CATALOG_REFRESH_SECONDS: int = 300
+    SERVER_TIMING_ENABLED: bool = True
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: str | None = None
+    SLOW_OPERATION_MS: int | None = 200
+    SLOW_OPERATION_EXPLAIN_RATE: float = 0.1
+    PROFILER_ENABLED: bool = True
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: conint(ge=1) = 20
+    PROFILE_INTERVAL_MS: float = 5
+    PROFILE_MAX_SECONDS: float = 30
+
+    @validator("MONGO_MAX_IDLE_TIME_MS", "MONGO_TIMEOUT_MS", "SLOW_OPERATION_MS", "METRICS_TOKEN", pre=True)
+    def empty_to_none(cls, value):
+        """
+        Las variables vacías, por ejemplo MONGO_TIMEOUT_MS=, desactivan el límite.
+        """
+        return None if value == "" else value
         
     class Config:
         env_file:str = ".env"
@@ -0,0 +1,82 @@
+import json
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+
+from app.core.config import get_settings
+from app.core.metrics import in_flight, observe_request
+from app.db.monitoring import CommandStats, command_stats
+
+logger = logging.getLogger(__name__)
+
+def route_template(scope: dict)->str:
+    """
+    Ruta declarada que atiende la solicitud, por ejemplo /chemicals/{id}, para agrupar las solicitudes por endpoint.
+    """
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def server_timing(stats: CommandStats, duration_ms: float)->str:
+    """
+    Valor del encabezado Server-Timing: el total de la solicitud, el de la base de datos y el de cada colección consultada.
+    """
+    summary = stats.as_dict()
+    entries = [
+        f"app;dur={duration_ms:.1f}",
+        f'db;dur={summary["duration_ms"]:.1f};desc="{summary["commands"]} commands"',
+    ]
+    for collection_name, collection_stats in summary["collections"].items():
+        entries.append(f'db.{collection_name};dur={collection_stats["duration_ms"]:.1f};desc="{collection_stats["commands"]} commands"')
+    return ", ".join(entries)
+
+class RequestInstrumentationMiddleware:
+    """
+    Registra los comandos de Mongo de cada solicitud, los reporta en el encabezado Server-Timing y escribe una línea de log en JSON al terminar.
+    También registra la duración y el código de estado de la solicitud en las métricas de su ruta.
+    Las respuestas en streaming envían los encabezados antes de consultar los lotes, por lo que solo la línea de log incluye todos sus comandos.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        stats = CommandStats(f"{scope['method']} {route}")
+        token = command_stats.set(stats)
+        in_flight["requests"] += 1
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if get_settings().SERVER_TIMING_ENABLED:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing(stats, (time.perf_counter() - start) * 1000))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - start
+            command_stats.reset(token)
+            in_flight["requests"] -= 1
+            observe_request(scope["method"], route, status_code, duration)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 3),
+                    "db": stats.as_dict(),
+                }))
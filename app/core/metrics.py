@@ -0,0 +1,110 @@
+from bisect import bisect_left
+import threading
+
+# Límites superiores, en segundos, de los buckets de los histogramas de solicitudes y de comandos de Mongo.
+request_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+command_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Histogram:
+    """
+    Histograma acumulativo en el formato de Prometheus. Las observaciones solo incrementan el bucket correspondiente; los totales acumulados se calculan al exportar.
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float)->None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# Los comandos de Mongo se registran desde los hilos de Motor y del monitoreo del pool, por lo que todas las métricas se modifican con este lock.
+metrics_lock = threading.Lock()
+request_counts: dict[tuple, int] = {}
+request_durations: dict[tuple, Histogram] = {}
+command_durations: dict[tuple, Histogram] = {}
+command_failures: dict[tuple, int] = {}
+pool_stats: dict[str, dict] = {}
+in_flight = {"requests": 0}
+
+def observe_request(method: str, route: str, status_code: int, duration: float)->None:
+    with metrics_lock:
+        key = (method, route, str(status_code))
+        request_counts[key] = request_counts.get(key, 0) + 1
+        histogram = request_durations.get((method, route))
+        if histogram is None:
+            histogram = request_durations[(method, route)] = Histogram(request_buckets)
+        histogram.observe(duration)
+
+def observe_command(collection_name: str, command_name: str, duration: float, failed: bool = False)->None:
+    with metrics_lock:
+        key = (collection_name, command_name)
+        histogram = command_durations.get(key)
+        if histogram is None:
+            histogram = command_durations[key] = Histogram(command_buckets)
+        histogram.observe(duration)
+        if failed:
+            command_failures[key] = command_failures.get(key, 0) + 1
+
+def update_pool(address: str, **changes: int)->None:
+    """
+    Suma los cambios ingresados a los contadores del pool de conexiones del servidor: open, checked_out y checkout_failures.
+    """
+    with metrics_lock:
+        stats = pool_stats.setdefault(address, {"open": 0, "checked_out": 0, "checkout_failures": 0})
+        for name, change in changes.items():
+            stats[name] += change
+
+def escape_label(value)->str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def label_set(names: tuple, values: tuple)->str:
+    labels = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + labels + "}" if labels else ""
+
+def format_metric(name: str, kind: str, description: str, samples: list[tuple])->list[str]:
+    """
+    Líneas de una métrica simple (counter o gauge) en el formato de texto de Prometheus. samples es una lista de la forma [(nombres, valores, valor)].
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{label_set(names, values)} {value}" for names, values, value in samples)
+    return lines
+
+def format_histograms(name: str, description: str, label_names: tuple, histograms: dict)->list[str]:
+    """
+    Líneas de un histograma en el formato de texto de Prometheus, con una serie por combinación de etiquetas.
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+    for label_values, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{label_set((*label_names, 'le'), (*label_values, bound))} {cumulative}")
+        lines.append(f"{name}_sum{label_set(label_names, label_values)} {histogram.sum}")
+        lines.append(f"{name}_count{label_set(label_names, label_values)} {histogram.count}")
+    return lines
+
+def render_collected()->list[str]:
+    """
+    Exporta las métricas registradas por las solicitudes, los comandos de Mongo y el pool de conexiones.
+    """
+    with metrics_lock:
+        return [
+            *format_metric("chems_http_requests_total", "counter", "Solicitudes atendidas por ruta y código de estado.",
+                [(("method", "route", "status"), key, count) for key, count in sorted(request_counts.items())]),
+            *format_histograms("chems_http_request_duration_seconds", "Duración de las solicitudes por ruta.", ("method", "route"), request_durations),
+            *format_metric("chems_http_requests_in_flight", "gauge", "Solicitudes en curso.", [((), (), in_flight["requests"])]),
+            *format_histograms("chems_mongo_command_duration_seconds", "Duración de los comandos de Mongo por colección.", ("collection", "command"), command_durations),
+            *format_metric("chems_mongo_command_failures_total", "counter", "Comandos de Mongo fallidos por colección.",
+                [(("collection", "command"), key, count) for key, count in sorted(command_failures.items())]),
+            *format_metric("chems_mongo_pool_connections", "gauge", "Conexiones abiertas del pool por servidor.",
+                [(("address",), (address,), stats["open"]) for address, stats in sorted(pool_stats.items())]),
+            *format_metric("chems_mongo_pool_checked_out", "gauge", "Conexiones del pool en uso por servidor.",
+                [(("address",), (address,), stats["checked_out"]) for address, stats in sorted(pool_stats.items())]),
+            *format_metric("chems_mongo_pool_checkout_failures_total", "counter", "Intentos fallidos de obtener una conexión del pool.",
+                [(("address",), (address,), stats["checkout_failures"]) for address, stats in sorted(pool_stats.items())]),
+        ]
@@ -0,0 +1,57 @@
+from app.core.cache import TTLCache
+from app.core.catalog import get_catalog
+from app.core.config import get_settings
+from app.crud.crud import get_document_by_query
+from app.db.database import db
+from app.models.py_object_id import PyObjectId
+
+users_collection = db.users
+
+# Usuario y rol ya resueltos de cada usuario autenticado, por nombre de usuario.
+principal_cache = TTLCache(get_settings().PRINCIPAL_CACHE_MAXSIZE, get_settings().PRINCIPAL_CACHE_TTL_SECONDS)
+
+async def get_principal(username: str)->dict | None:
+    """
+    Obtiene el usuario y su rol de la caché o, si no están, de la base de datos. Retorna un diccionario de la forma {"user": usuario, "role": rol}.
+    """
+    principal = principal_cache.get(username)
+    if principal is None:
+        user = await get_document_by_query({"username": username}, users_collection)
+        if user is None:
+            return None
+        role = (await get_catalog("roles")).get(user.get("role"))
+        principal = {"user": user, "role": role}
+        principal_cache.set(username, principal)
+    return principal
+
+async def get_user_role(user: dict)->str | None:
+    """
+    Obtiene el rol del usuario, usando la caché cuando corresponde al mismo usuario y rol.
+    """
+    principal = principal_cache.get(user.get("username"))
+    if principal and principal["user"]["_id"] == user["_id"] and principal["user"].get("role") == user.get("role"):
+        role = principal["role"]
+    else:
+        role = (await get_catalog("roles")).get(user.get("role"))
+    return role["role"] if role else None
+
+def invalidate_user(id: PyObjectId)->None:
+    """
+    Elimina de la caché el usuario del ID ingresado.
+    """
+    principal_cache.discard_where(lambda _, principal: principal["user"]["_id"] == id)
+
+def invalidate_role(id: PyObjectId | None = None)->None:
+    """
+    Elimina de la caché los usuarios con el rol del ID ingresado, o todos si no se ingresa un ID.
+    """
+    if id is None:
+        principal_cache.clear()
+        return
+    principal_cache.discard_where(lambda _, principal: principal["user"].get("role") == id)
+
+def invalidate_area(id: PyObjectId)->None:
+    """
+    Elimina de la caché los usuarios que tienen el área del ID ingresado, por ejemplo después de retirarla de sus áreas al desactivarla.
+    """
+    principal_cache.discard_where(lambda _, principal: id in principal["user"].get("areas", []))
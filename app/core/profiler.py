@@ -0,0 +1,166 @@
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import re
+import site
+import sys
+import sysconfig
+import threading
+import time
+
+from fastapi import HTTPException
+from starlette.datastructures import MutableHeaders
+
+from app.core.auth import get_current_user, validate_role
+from app.core.config import get_settings
+
+class SamplingProfiler:
+    """
+    Muestrea en un hilo aparte las pilas de todos los hilos del proceso cada PROFILE_INTERVAL_MS y las acumula en formato folded (raíz;...;hoja cantidad),
+    el que usan flamegraph.pl y speedscope. El event loop y los hilos de Motor atienden también otras solicitudes, por lo que sus muestras se mezclan con las de la solicitud perfilada.
+    """
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+
+    def start(self)->None:
+        self.thread.start()
+
+    def stop(self)->None:
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self)->None:
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self.stopped.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self)->str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def is_idle(frame)->bool:
+    """
+    Indica si el hilo está detenido esperando trabajo, como los hilos libres de los ThreadPoolExecutor.
+    """
+    return frame.f_code.co_name == "wait" and frame.f_code.co_filename.endswith("threading.py")
+
+# Prefijos que se quitan de las rutas de los archivos para acortar las etiquetas: site-packages, la biblioteca estándar y el directorio de la aplicación.
+path_prefixes = sorted({*site.getsitepackages(), sysconfig.get_paths()["stdlib"], str(Path.cwd())}, key=len, reverse=True)
+
+def frame_label(frame)->str:
+    filename = frame.f_code.co_filename
+    for prefix in path_prefixes:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip("/\\")
+            break
+    return f"{frame.f_code.co_name} ({filename}:{frame.f_code.co_firstlineno})".replace(";", ",")
+
+def profile_files()->list[Path]:
+    """
+    Perfiles guardados, del más antiguo al más reciente.
+    """
+    directory = Path(get_settings().PROFILE_DIR)
+    return sorted(directory.glob("*.folded")) if directory.is_dir() else []
+
+def save_profile(name: str, folded: str)->None:
+    """
+    Guarda el perfil y elimina los más antiguos para conservar como máximo PROFILE_MAX_FILES.
+    """
+    directory = Path(get_settings().PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(folded, encoding="utf-8")
+    files = profile_files()
+    for old_file in files[:max(0, len(files) - get_settings().PROFILE_MAX_FILES)]:
+        old_file.unlink(missing_ok=True)
+
+def profile_mode(scope: dict)->str | None:
+    """
+    Retorna "inline" o "store" si la solicitud pide ser perfilada con el encabezado X-Profile o el parámetro profile, o None si no lo pide.
+    """
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return "inline" if value == b"inline" else "store"
+    query = scope["query_string"]
+    if b"profile=" in query:
+        match = re.search(rb"(?:^|&)profile=([^&]*)", query)
+        if match:
+            return "inline" if match.group(1) == b"inline" else "store"
+    return None
+
+async def is_admin(scope: dict)->bool:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return False
+            try:
+                await validate_role(await get_current_user(token))
+            except HTTPException:
+                return False
+            return True
+    return False
+
+class ProfilerMiddleware:
+    """
+    Perfila la solicitud de un administrador que envía X-Profile (o ?profile=). Con el valor inline la respuesta se reemplaza por el perfil;
+    con cualquier otro valor el perfil se guarda en PROFILE_DIR y su nombre se retorna en el encabezado X-Profile-Id. Las demás solicitudes solo revisan los encabezados.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = profile_mode(scope) if scope["type"] == "http" else None
+        if mode is None or not await is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        profiler = SamplingProfiler(settings.PROFILE_INTERVAL_MS / 1000, settings.PROFILE_MAX_SECONDS)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{re.sub(r'[^A-Za-z0-9]+', '_', scope['path']).strip('_') or 'root'}.folded"
+        status_code = 500
+
+        async def send_with_profile(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if mode == "store":
+                    MutableHeaders(scope=message).append("X-Profile-Id", name)
+            if mode == "store":
+                await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profiler.stop()
+
+        if mode == "store":
+            save_profile(name, profiler.folded())
+            return
+        body = profiler.folded().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profile-status", str(status_code).encode()),
+                (b"x-profile-samples", str(profiler.samples).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
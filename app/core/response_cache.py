@@ -0,0 +1,49 @@
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+# Respuestas ya serializadas de las lecturas más frecuentes. Cada entrada es un diccionario de la forma
+# {"body": bytes, "headers": dict, "media_type": str, "tags": set} y tags son las colecciones de las que depende la respuesta.
+response_cache = TTLCache(get_settings().RESPONSE_CACHE_MAXSIZE, get_settings().RESPONSE_CACHE_TTL_SECONDS)
+
+# Cantidad de invalidaciones de cada colección. Una lectura solo se guarda si ninguna de sus colecciones cambió mientras se calculaba.
+collection_generations: dict[str, int] = {}
+
+def cache_generations(tags: set)->tuple:
+    """
+    Retorna las generaciones actuales de las colecciones de las que depende una respuesta.
+    """
+    return tuple(collection_generations.get(tag, 0) for tag in sorted(tags))
+
+def get_cached_response(key)->dict | None:
+    return response_cache.get(key)
+
+def set_cached_response(key, entry: dict, generations: tuple)->bool:
+    """
+    Guarda la respuesta si sus colecciones no se modificaron desde que se tomaron las generaciones. Retorna si se guardó.
+    """
+    if cache_generations(entry["tags"]) != generations:
+        return False
+    response_cache.set(key, entry)
+    return True
+
+def invalidate_collections(*collection_names: str)->int:
+    """
+    Elimina de la caché las respuestas que dependen de alguna de las colecciones ingresadas. Retorna la cantidad eliminada.
+    """
+    names = set(collection_names)
+    for name in names:
+        collection_generations[name] = collection_generations.get(name, 0) + 1
+    return response_cache.discard_where(lambda _, entry: not entry["tags"].isdisjoint(names))
+
+def cache_stats()->dict:
+    """
+    Retorna el tamaño y los aciertos y fallos de la caché de respuestas.
+    """
+    requests = response_cache.hits + response_cache.misses
+    return {
+        "size": len(response_cache),
+        "maxsize": response_cache.maxsize,
+        "hits": response_cache.hits,
+        "misses": response_cache.misses,
+        "hit_ratio": response_cache.hits / requests if requests else 0.0,
+    }
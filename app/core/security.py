@@ -1,9 +1,31 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
+from app.core.config import get_settings
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt libera el GIL, por lo que un grupo de hilos propio evita bloquear el event loop sin afectar al resto de operaciones.
+hashing_executor = ThreadPoolExecutor(max_workers=get_settings().HASHING_MAX_WORKERS, thread_name_prefix="bcrypt")
+hashing_queue = {"depth": 0}
+
+async def run_hashing(function, *args):
+    """
+    Ejecuta una operación de bcrypt en el grupo de hilos de hashing. Rechaza la solicitud si ya hay demasiadas operaciones en espera.
+    """
+    if hashing_queue["depth"] >= get_settings().HASHING_MAX_QUEUE:
+        raise HTTPException(status_code=503, detail="El servidor está ocupado, intente nuevamente", headers={"Retry-After": "1"})
+    hashing_queue["depth"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hashing_executor, function, *args)
+    finally:
+        hashing_queue["depth"] -= 1
+
+async def verify_password(plain_password, hashed_password):
+    return await run_hashing(pwd_context.verify, plain_password, hashed_password)
 
-def hash_password(password):
-    return pwd_context.hash(password)
\ No newline at end of file
+async def hash_password(password):
+    return await run_hashing(pwd_context.hash, password)
@@ -1,31 +1,162 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import binascii
 from datetime import datetime
+import re
 import unicodedata
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
 from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 
+from app.core.config import get_settings
+from app.core.response_cache import invalidate_collections
 from app.models.py_object_id import PyObjectId
 from app.models.enums import QueryStatus, SearchKeys
 
-async def get_documents(
-    collection,
-    skip: int = 0, 
-    limit: int | None = None, 
+def utc_now()->datetime:
+    """
+    Retorna la fecha y hora UTC actual con la precisión de milisegundos con la que Mongo guarda las fechas.
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def fold_text(text: str)->str:
+    """
+    Elímina acentos y pone en minúscula todo el texto, igual que text_normalizer_lower.
+    """
+    nfkd_form = unicodedata.normalize('NFKD', text.casefold())
+    return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
+
+def search_terms(text: str)->list[str]:
+    """
+    Retorna el texto normalizado desde cada una de sus palabras, por ejemplo ["acido sulfurico", "sulfurico"].
+    Una búsqueda por prefijo sobre esta lista encuentra el texto por el inicio de cualquiera de sus palabras.
+    """
+    words = fold_text(text).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+def search_prefix(query_value: str)->str:
+    """
+    Normaliza el texto buscado de la misma forma que los campos de búsqueda.
+    """
+    return " ".join(fold_text(query_value).split())
+
+def collection_search_keys(collection)->list[str]:
+    """
+    Retorna los campos en los que se puede buscar en la colección.
+    """
+    return SearchKeys[collection.name] if collection.name in SearchKeys.__members__ else []
+
+def model_fields(model: type[BaseModel])->tuple[str, ...]:
+    """
+    Retorna los campos, por su alias, que serializa el modelo. Al poblar una relación con ellos solo se leen de Mongo los campos que se retornan.
+    """
+    return tuple(field.alias for field in model.__fields__.values())
+
+def fields_projection(fields: str | tuple[str, ...] | None)->dict | None:
+    """
+    Convierte un campo o una tupla de campos en una proyección de Mongo. Retorna None, el documento completo, si no se ingresan campos.
+    """
+    if not fields:
+        return None
+    return {field: True for field in ((fields,) if type(fields) is str else fields)}
+
+def set_search_fields(document: dict, collection)->dict:
+    """
+    Agrega los campos normalizados search_<campo> de los campos de búsqueda presentes en el documento.
+    """
+    for search_key in collection_search_keys(collection):
+        if type(document.get(search_key)) is str:
+            document[f"search_{search_key}"] = search_terms(document[search_key])
+    return document
+
+def build_query(
     status: QueryStatus = QueryStatus.all,
     query_keys: SearchKeys | None = None, 
-    query_value: str | None = None
-    )->list:
+    query_value: str | None = None,
+    after: PyObjectId | None = None
+    )->dict:
+    """
+    Construye el filtro de Mongo para el estado, la búsqueda y el cursor ingresados.
+    """
     query = {"status": True} if status == QueryStatus.active else {"status": False} if status == QueryStatus.inactive else {}
     if query_keys and query_value:
-        nfkd_form = unicodedata.normalize('NFKD', query_value)
-        query_value = u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
-        query_value = {"$regex": f"{(query_value)}*", "$options" :'i'}
+        query_value = {"$regex": "^" + re.escape(search_prefix(query_value))}
         query_data = {"$or":[]}
         for seach_key in query_keys:
-            query_data["$or"].append({seach_key: query_value})
+            query_data["$or"].append({f"search_{seach_key}": query_value})
         query.update(query_data)
-    
+    if after:
+        query["_id"] = {"$gt": after}
+    return query
+
+async def get_documents(
+    collection,
+    skip: int = 0, 
+    limit: int | None = None, 
+    status: QueryStatus = QueryStatus.all,
+    query_keys: SearchKeys | None = None, 
+    query_value: str | None = None,
+    after: PyObjectId | None = None,
+    sort: list | None = None
+    )->list:
+    documents = await find_documents(collection, skip, limit, status, query_keys, query_value, after, sort).to_list(limit)
+    return documents
 
-    documents = await collection.find(query).skip(skip).to_list(limit)
+def find_documents(
+    collection,
+    skip: int = 0, 
+    limit: int | None = None, 
+    status: QueryStatus = QueryStatus.all,
+    query_keys: SearchKeys | None = None, 
+    query_value: str | None = None,
+    after: PyObjectId | None = None,
+    sort: list | None = None
+    ):
+    """
+    Construye el cursor de Motor de la consulta sin ejecutarlo.
+    """
+    query = build_query(status, query_keys, query_value, after)
+    documents = collection.find(query).skip(skip)
+    if sort:
+        documents = documents.sort(sort)
+    if limit:
+        documents = documents.limit(limit)
     return documents
+
+async def aggregate_documents(collection, pipeline: list)->list:
+    documents = await collection.aggregate(pipeline).to_list(None)
+    return documents
+
+async def iter_batches(cursor, batch_size: int):
+    """
+    Recorre un cursor de Motor y entrega los documentos en listas de máximo batch_size elementos.
+    """
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+    
+def encode_cursor(id: PyObjectId)->str:
+    """
+    Convierte el MongoID del último documento de una página en un cursor opaco.
+    """
+    return urlsafe_b64encode(ObjectId(id).binary).decode().rstrip("=")
+
+def decode_cursor(cursor: str)->PyObjectId:
+    """
+    Obtiene el MongoID contenido en un cursor generado por encode_cursor.
+    """
+    try:
+        return ObjectId(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor no válido")
     
 async def get_document_by_id(id: PyObjectId, collection)->dict:
     document = await collection.find_one({"_id": id})
@@ -40,37 +171,68 @@ async def get_document_by_query(query: dict, collection)->dict | None:
 
 async def create_document(document: BaseModel, collection):  
     document = document.dict() if type(document) is not dict else document
-    new_document = await collection.insert_one(document)
-    created_document = await get_document_by_id(new_document.inserted_id, collection)
-    return created_document
+    document = set_search_fields(document, collection)
+    await collection.insert_one(document)
+    invalidate_collections(collection.name)
+    return document
+
+async def create_documents(documents: list[dict], collection)->list:
+    """
+    Inserta varios documentos con insert_many sin detenerse en el primer error. Retorna el MongoID de cada documento o la excepción que impidió insertarlo.
+    """
+    documents = [set_search_fields(document, collection) for document in documents]
+    try:
+        inserted = await collection.insert_many(documents, ordered=False)
+        return inserted.inserted_ids
+    except BulkWriteError as error:
+        results = [document.get("_id") for document in documents]
+        for write_error in error.details.get("writeErrors", []):
+            results[write_error["index"]] = write_error
+        return results
+    finally:
+        invalidate_collections(collection.name)
 
 async def update_document(id: PyObjectId, collection, new_data: BaseModel | dict):
     if type(new_data) is not dict:
         new_data = new_data.dict(exclude_unset = True, exclude_none = True, exclude_defaults=True)
     else: 
         new_data = {k: v for k, v in new_data.items() if v}
-    await collection.update_one({"_id": id}, {"$set": new_data})   
-    updated_document = await get_document_by_id(id, collection)
+    new_data = set_search_fields(new_data, collection)
+    updated_document = await collection.find_one_and_update({"_id": id}, {"$set": new_data}, return_document=ReturnDocument.AFTER)
+    invalidate_collections(collection.name)
     return updated_document
 
 
-async def delete_restore_document(id: PyObjectId, collection, user: dict, collection_to_update = None, field_to_update: str | None = None,):
-    
-    deleted_document = await get_document_by_id(id, collection)
-    current_status = deleted_document["status"]
-    await collection.update_one({"_id": id}, {"$set": {
-        "status": not current_status,
+async def delete_restore_document(id: PyObjectId, collection, user: dict, collection_to_update = None, field_to_update: str | None = None,)->tuple[dict, int]:
+    """
+    Cambia el estado del documento. Al desactivarlo, retira su MongoID del campo field_to_update de todos los documentos de collection_to_update.
+    Retorna el documento actualizado y la cantidad de documentos modificados en collection_to_update.
+    Con USE_TRANSACTIONS, el cambio de estado y la eliminación de referencias se ejecutan en una misma transacción.
+    """
+    try:
+        if not get_settings().USE_TRANSACTIONS:
+            return await toggle_status(id, collection, user, collection_to_update, field_to_update)
+
+        async with await collection.database.client.start_session() as session:
+            return await session.with_transaction(
+                lambda session: toggle_status(id, collection, user, collection_to_update, field_to_update, session)
+            )
+    finally:
+        invalidate_collections(collection.name, *([collection_to_update.name] if collection_to_update is not None else []))
+
+async def toggle_status(id: PyObjectId, collection, user: dict, collection_to_update = None, field_to_update: str | None = None, session = None)->tuple[dict, int]:
+    """
+    Invierte el estado del documento con una actualización atómica y retorna el documento resultante en la misma operación.
+    """
+    deleted_document = await collection.find_one_and_update({"_id": id}, [{"$set": {
+        "status": {"$not": "$status"},
         "last_update_by": user["_id"],
-        "last_update_date": datetime.utcnow()
-        }})
-    deleted_document = await get_document_by_id(id, collection)
+        "last_update_date": utc_now()
+        }}], return_document=ReturnDocument.AFTER, session=session)
     
-    if field_to_update and current_status:
-        documents_to_update = await collection_to_update.find({field_to_update: {"$all": [id]}}).to_list(None)
-        for document in documents_to_update:
-            updated_field = document[field_to_update]
-            updated_field.remove(id)
-            await collection_to_update.update_one({"_id": document["_id"]}, {"$set": {field_to_update: updated_field}})
-
-    return deleted_document
+    modified_count = 0
+    if field_to_update and not deleted_document["status"]:
+        result = await collection_to_update.update_many({field_to_update: id}, {"$pull": {field_to_update: id}}, session=session)
+        modified_count = result.modified_count
 
+    return deleted_document, modified_count
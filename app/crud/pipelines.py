@@ -0,0 +1,85 @@
+import re
+
+from app.crud.crud import fields_projection, search_prefix
+
+def relevance_score(query_keys: list[str], query_value: str)->dict:
+    """
+    Construye la expresión que puntúa la relevancia de un resultado de búsqueda: 2 si el campo completo es igual al texto buscado,
+    1 si el campo inicia con el texto buscado y 0 si solo coincide el inicio de otra de sus palabras.
+    """
+    prefix = search_prefix(query_value)
+    scores = []
+    for search_key in query_keys:
+        full_text = {"$arrayElemAt": [f"$search_{search_key}", 0]}
+        scores.append({"$cond": [
+            {"$eq": [full_text, prefix]},
+            2,
+            {"$cond": [{"$regexMatch": {"input": full_text, "regex": "^" + re.escape(prefix)}}, 1, 0]},
+        ]})
+    return {"$add": scores}
+
+def lookup_stages(field_with_nested_ids: str, collection, field_to_populate: str | tuple[str, ...] | None = None)->list:
+    """
+    Construye las etapas $lookup/$addFields que pueblan un campo con MongoIDs, ya sea una lista o un único ID.
+    Los elementos de las listas conservan el orden de los IDs originales y solo incluyen los campos a poblar, si se ingresan.
+    """
+    joined = "__" + field_with_nested_ids.replace(".", "_")
+    lookup = {
+        "from": collection.name,
+        "localField": field_with_nested_ids,
+        "foreignField": "_id",
+        "as": joined,
+    }
+    projection = fields_projection(field_to_populate)
+    if projection:
+        lookup["pipeline"] = [{"$project": projection}]
+
+    ordered_items = {"$map": {
+        "input": {"$filter": {
+            "input": f"${field_with_nested_ids}",
+            "as": "id",
+            "cond": {"$in": ["$$id", f"${joined}._id"]},
+        }},
+        "as": "id",
+        "in": {"$arrayElemAt": [f"${joined}", {"$indexOfArray": [f"${joined}._id", "$$id"]}]},
+    }}
+
+    return [
+        {"$lookup": lookup},
+        {"$addFields": {field_with_nested_ids: {"$cond": [
+            {"$isArray": f"${field_with_nested_ids}"},
+            ordered_items,
+            {"$arrayElemAt": [f"${joined}", 0]},
+        ]}}},
+    ]
+
+def read_pipeline(
+    relations: tuple,
+    query: dict | None = None,
+    skip: int = 0,
+    limit: int | None = None,
+    sort: list | None = None,
+    computed_fields: dict | None = None,
+    )->list:
+    """
+    Construye una agregación $match/$skip/$limit/$lookup/$project que retorna los documentos ya poblados en una sola consulta.
+    Los campos calculados se pueden usar para ordenar y no se incluyen en el resultado.
+    """
+    pipeline = [{"$match": query or {}}]
+    if computed_fields:
+        pipeline.append({"$addFields": computed_fields})
+    if sort:
+        pipeline.append({"$sort": dict(sort)})
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit:
+        pipeline.append({"$limit": limit})
+
+    joined_fields = {field: False for field in computed_fields or {}}
+    for relation in relations:
+        pipeline.extend(lookup_stages(*relation))
+        joined_fields["__" + relation[0].replace(".", "_")] = False
+
+    if joined_fields:
+        pipeline.append({"$project": joined_fields})
+    return pipeline
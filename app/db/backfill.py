@@ -0,0 +1,33 @@
+import asyncio
+
+from pymongo import UpdateOne
+
+from app.crud.crud import collection_search_keys, set_search_fields
+from app.db.database import db
+from app.models.enums import Collections
+
+async def backfill_search_fields(batch_size: int = 500)->dict:
+    """
+    Escribe los campos search_<campo> de los documentos existentes. Sus índices se declaran en app.db.indexes. Retorna la cantidad de documentos actualizados por colección.
+    """
+    report = {}
+    for collection_name in Collections:
+        collection = db[collection_name.value]
+        search_keys = collection_search_keys(collection)
+        updated = 0
+        operations = []
+        async for document in collection.find({}, {search_key: True for search_key in search_keys}):
+            search_fields = {k: v for k, v in set_search_fields(document, collection).items() if k.startswith("search_")}
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": search_fields}))
+            if len(operations) == batch_size:
+                updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+        report[collection_name.value] = updated
+    return report
+
+
+if __name__ == "__main__":
+    for collection_name, updated in asyncio.run(backfill_search_fields()).items():
+        print(f"{collection_name}: {updated} documentos actualizados")
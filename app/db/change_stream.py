@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.catalog import catalog_names, invalidate_catalog, load_catalogs
+from app.core.config import get_settings
+from app.core.principal import invalidate_role, invalidate_user
+from app.core.response_cache import invalidate_collections
+from app.db.database import db
+from app.models.enums import Collections
+
+logger = logging.getLogger(__name__)
+
+# Códigos de error del servidor: 40573 indica que el servidor no es un replica set, por lo que no admite flujos de cambio.
+# 286 y 280 indican que el resume token ya no está en el oplog o que no es posible reanudar el flujo.
+change_streams_unsupported = {40573}
+resume_token_lost = {286, 280}
+
+watched_collections = [collection.value for collection in Collections]
+watched_operations = ["insert", "update", "replace", "delete", "drop", "rename", "dropDatabase", "invalidate"]
+
+watcher_state = {"status": "stopped", "events": 0, "resume_token": None, "error": None}
+
+def clear_caches()->None:
+    """
+    Descarta todas las cachés locales. Se usa cuando pudieron perderse eventos de cambio.
+    """
+    invalidate_collections(*watched_collections)
+    invalidate_catalog()
+    invalidate_role()
+
+def apply_change(change: dict)->None:
+    """
+    Invalida las cachés locales afectadas por un evento de cambio de otra instancia o de esta misma.
+    """
+    collection_name = change.get("ns", {}).get("coll")
+    if collection_name is None:
+        clear_caches()
+        return
+
+    id = change.get("documentKey", {}).get("_id")
+    invalidate_collections(collection_name)
+    if collection_name in catalog_names:
+        invalidate_catalog(collection_name)
+    if collection_name == Collections.users.value:
+        if id is None:
+            invalidate_role()
+        else:
+            invalidate_user(id)
+    if collection_name == Collections.roles.value:
+        invalidate_role(id)
+
+async def refresh_catalogs()->None:
+    """
+    Sin flujos de cambio, vuelve a cargar los catálogos cada CATALOG_REFRESH_SECONDS. Las demás cachés expiran por su TTL.
+    """
+    watcher_state["status"] = "ttl"
+    while True:
+        await asyncio.sleep(get_settings().CATALOG_REFRESH_SECONDS)
+        try:
+            await load_catalogs()
+        except PyMongoError as error:
+            logger.warning("could not refresh catalogs: %s", error)
+
+async def watch_changes()->None:
+    """
+    Sigue los cambios de las colecciones de la base de datos de MONGO_DATABASE e invalida las cachés locales. Reanuda el flujo con el último resume token tras un error.
+    Si el servidor no admite flujos de cambio, por ejemplo un servidor standalone, queda en modo TTL.
+    """
+    pipeline = [{"$match": {"operationType": {"$in": watched_operations}}}]
+    retry_delay = 1
+    while True:
+        try:
+            async with db.watch(pipeline, resume_after=watcher_state["resume_token"]) as stream:
+                watcher_state.update(status="watching", error=None)
+                retry_delay = 1
+                while stream.alive:
+                    change = await stream.try_next()
+                    watcher_state["resume_token"] = stream.resume_token
+                    if change is not None:
+                        watcher_state["events"] += 1
+                        apply_change(change)
+                        if change["operationType"] == "invalidate":
+                            watcher_state["resume_token"] = None
+        except OperationFailure as error:
+            if error.code in change_streams_unsupported:
+                logger.warning("change streams are not available, caches will rely on TTL expiry: %s", error)
+                watcher_state.update(status="ttl", error=str(error))
+                await refresh_catalogs()
+                return
+            if error.code in resume_token_lost:
+                logger.warning("change stream history lost, clearing local caches: %s", error)
+                watcher_state["resume_token"] = None
+                clear_caches()
+                continue
+            logger.error("change stream failed: %s", error)
+            watcher_state.update(status="retrying", error=str(error))
+        except PyMongoError as error:
+            logger.warning("change stream interrupted, resuming: %s", error)
+            watcher_state.update(status="retrying", error=str(error))
+
+        if watcher_state["resume_token"] is None:
+            clear_caches()
+        await asyncio.sleep(retry_delay)
+        retry_delay = min(retry_delay * 2, 30)
+
+
+if __name__ == "__main__":
+    # Muestra los eventos y las invalidaciones que aplicaría cada instancia. Requiere un replica set, por ejemplo uno local de un solo nodo.
+    logging.basicConfig(level=logging.INFO)
+
+    async def print_changes():
+        async with db.watch([{"$match": {"operationType": {"$in": watched_operations}}}]) as stream:
+            print(f"watching {db.name}, press Ctrl+C to stop")
+            async for change in stream:
+                apply_change(change)
+                print(change["operationType"], change.get("ns", {}).get("coll"), change.get("documentKey", {}).get("_id"))
+
+    try:
+        asyncio.run(print_changes())
+    except KeyboardInterrupt:
+        pass
@@ -3,8 +3,42 @@ import certifi
 import pymongo
 
 from app.core.config import get_settings
+from app.db.monitoring import command_listener, pool_listener
 
-client = AsyncIOMotorClient(get_settings().CONNECTION_STRING, tlsCAFile=certifi.where())
+def client_options()->dict:
+    """
+    Opciones del cliente de Mongo definidas en la configuración. MONGO_TIMEOUT_MS limita cada operación y el driver lo envía como maxTimeMS.
+    Con MONGO_TLS en False se omite el certificado de certifi, que activa TLS, para conectarse a un mongod local.
+    Los listeners registran los comandos y el uso del pool para el encabezado Server-Timing y las métricas.
+    """
+    settings = get_settings()
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "timeoutMS": settings.MONGO_TIMEOUT_MS,
+        "event_listeners": [command_listener, pool_listener],
+    }
+    if settings.MONGO_TLS:
+        options["tlsCAFile"] = certifi.where()
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
 
-db = client["ChemApp_DB"]
+# El cliente no se conecta al crearse: la conexión se abre en connect_database, llamada desde el lifespan de la aplicación.
+client = AsyncIOMotorClient(get_settings().CONNECTION_STRING, **client_options())
 
+db = client[get_settings().MONGO_DATABASE]
+
+async def connect_database()->None:
+    """
+    Verifica la conexión con un ping. Tras la primera conexión el driver mantiene abiertas MONGO_MIN_POOL_SIZE conexiones en segundo plano.
+    """
+    await client.admin.command("ping")
+
+def close_database()->None:
+    """
+    Cierra las conexiones del cliente.
+    """
+    client.close()
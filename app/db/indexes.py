@@ -0,0 +1,84 @@
+import asyncio
+import sys
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.db.database import db
+from app.models.enums import Collections, SearchKeys
+
+def search_indexes(collection_name: str)->list[IndexModel]:
+    """
+    Índices de los campos search_<campo> que utiliza la búsqueda por prefijo de la colección.
+    """
+    return [IndexModel([(f"search_{search_key}", ASCENDING)], name=f"search_{search_key}") for search_key in SearchKeys[collection_name].value]
+
+# Índices declarados por colección. Los índices únicos corresponden a los campos cuyos duplicados ya rechaza la API.
+index_specs = {
+    Collections.users.value: [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("areas", ASCENDING)], name="areas"),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("last_update_date", ASCENDING)], name="last_update_date"),
+        *search_indexes(Collections.users.value),
+    ],
+    Collections.chemicals.value: [
+        IndexModel([("chemical", ASCENDING)], name="chemical_unique", unique=True),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("last_update_date", ASCENDING)], name="last_update_date"),
+        *search_indexes(Collections.chemicals.value),
+    ],
+    Collections.areas.value: [
+        IndexModel([("area", ASCENDING)], name="area_unique", unique=True),
+        IndexModel([("chemicals", ASCENDING)], name="chemicals"),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("last_update_date", ASCENDING)], name="last_update_date"),
+        *search_indexes(Collections.areas.value),
+    ],
+    Collections.hazards.value: search_indexes(Collections.hazards.value),
+    Collections.ppes.value: search_indexes(Collections.ppes.value),
+    Collections.roles.value: search_indexes(Collections.roles.value),
+}
+
+async def ensure_indexes(create: bool = True)->dict:
+    """
+    Compara los índices de cada colección con index_specs y, si create es True, crea los que faltan. Crear un índice existente no tiene efecto.
+    Retorna un reporte por colección con los índices creados, faltantes, sobrantes y los errores de creación, por ejemplo duplicados en un índice único.
+    """
+    report = {}
+    for collection_name, specs in index_specs.items():
+        collection = db[collection_name]
+        existing = [index["name"] async for index in collection.list_indexes()]
+        missing = [spec for spec in specs if spec.document["name"] not in existing]
+        collection_report = {
+            "created": [],
+            "missing": [spec.document["name"] for spec in missing],
+            "extra": [name for name in existing if name != "_id_" and name not in {spec.document["name"] for spec in specs}],
+            "errors": {},
+        }
+        if create:
+            for spec in missing:
+                try:
+                    await collection.create_indexes([spec])
+                except OperationFailure as error:
+                    collection_report["errors"][spec.document["name"]] = error.details.get("errmsg", str(error)) if error.details else str(error)
+                else:
+                    collection_report["created"].append(spec.document["name"])
+            collection_report["missing"] = list(collection_report["errors"])
+        report[collection_name] = collection_report
+    return report
+
+
+if __name__ == "__main__":
+    check_only = "--check" in sys.argv
+    report = asyncio.run(ensure_indexes(create=not check_only))
+    for collection_name, collection_report in report.items():
+        print(f"{collection_name}:")
+        for key in ("created", "missing", "extra"):
+            if collection_report[key]:
+                print(f"  {key}: {', '.join(collection_report[key])}")
+        for name, error in collection_report["errors"].items():
+            print(f"  error {name}: {error}")
+    if check_only and any(collection_report["missing"] for collection_report in report.values()):
+        sys.exit(1)
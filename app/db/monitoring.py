@@ -0,0 +1,128 @@
+from contextvars import ContextVar
+import threading
+
+from pymongo import monitoring
+
+from app.core.config import get_settings
+from app.core.metrics import observe_command, update_pool
+from app.db.slow_operations import record_slow_operation
+
+class CommandStats:
+    """
+    Comandos enviados a Mongo durante una solicitud: cantidad y duración total, y el detalle por colección.
+    Motor ejecuta los comandos en hilos con una copia del contexto, por lo que los contadores se protegen con un lock.
+    """
+    __slots__ = ("route", "commands", "duration_ms", "collections", "lock")
+
+    def __init__(self, route: str | None = None):
+        self.route = route
+        self.commands = 0
+        self.duration_ms = 0.0
+        self.collections: dict[str, list] = {}
+        self.lock = threading.Lock()
+
+    def record(self, collection_name: str, duration_ms: float)->None:
+        with self.lock:
+            self.commands += 1
+            self.duration_ms += duration_ms
+            collection_stats = self.collections.setdefault(collection_name, [0, 0.0])
+            collection_stats[0] += 1
+            collection_stats[1] += duration_ms
+
+    def as_dict(self)->dict:
+        with self.lock:
+            return {
+                "commands": self.commands,
+                "duration_ms": round(self.duration_ms, 3),
+                "collections": {name: {"commands": count, "duration_ms": round(duration, 3)} for name, (count, duration) in sorted(self.collections.items())},
+            }
+
+# Estadísticas de la solicitud en curso. Fuera de una solicitud, por ejemplo en el lifespan o en los scripts, los comandos solo se registran en las métricas.
+command_stats: ContextVar[CommandStats | None] = ContextVar("command_stats", default=None)
+
+def command_collection(event: monitoring.CommandStartedEvent)->str:
+    """
+    Colección a la que se dirige el comando. getMore la indica en el campo collection y los comandos sin colección, como ping, se agrupan por base de datos.
+    """
+    target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+    return target if isinstance(target, str) else event.database_name
+
+def is_slow_candidate(command_name: str, stats: CommandStats | None)->bool:
+    """
+    Indica si el comando puede registrarse como operación lenta. Se excluyen los explain de las propias operaciones lentas y los getMore fuera de una solicitud,
+    como los del flujo de cambios, que esperan nuevos eventos durante cerca de un segundo cuando la base de datos está inactiva.
+    """
+    if command_name == "explain":
+        return False
+    return command_name != "getMore" or stats is not None
+
+class CommandStatsListener(monitoring.CommandListener):
+    """
+    Registra la duración de cada comando en las métricas por colección y, dentro de una solicitud, en sus estadísticas.
+    Los eventos de fin no incluyen el comando, por lo que la colección y las estadísticas se guardan al iniciar, con la conexión y el request_id como clave.
+    Los comandos que tardan al menos SLOW_OPERATION_MS se registran como operaciones lentas, salvo los que excluye is_slow_candidate.
+    """
+    def __init__(self):
+        self.pending: dict[tuple, tuple] = {}
+        self.slow_operation_ms = get_settings().SLOW_OPERATION_MS
+
+    def started(self, event: monitoring.CommandStartedEvent)->None:
+        self.pending[(event.connection_id, event.request_id)] = (command_collection(event), event.command_name, command_stats.get(), event.command, event.database_name)
+
+    def finish(self, event, failed: bool)->None:
+        started = self.pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        collection_name, command_name, stats, command, database_name = started
+        duration_ms = event.duration_micros / 1000
+        observe_command(collection_name, command_name, duration_ms / 1000, failed)
+        if stats is not None:
+            stats.record(collection_name, duration_ms)
+        if self.slow_operation_ms is not None and duration_ms >= self.slow_operation_ms and is_slow_candidate(command_name, stats):
+            record_slow_operation(stats.route if stats else None, database_name, collection_name, command_name, command, duration_ms)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent)->None:
+        self.finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent)->None:
+        self.finish(event, failed=True)
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Lleva la cuenta de las conexiones abiertas y en uso del pool de cada servidor.
+    """
+    def connection_created(self, event)->None:
+        update_pool(f"{event.address[0]}:{event.address[1]}", open=1)
+
+    def connection_closed(self, event)->None:
+        update_pool(f"{event.address[0]}:{event.address[1]}", open=-1)
+
+    def connection_checked_out(self, event)->None:
+        update_pool(f"{event.address[0]}:{event.address[1]}", checked_out=1)
+
+    def connection_checked_in(self, event)->None:
+        update_pool(f"{event.address[0]}:{event.address[1]}", checked_out=-1)
+
+    def connection_check_out_failed(self, event)->None:
+        update_pool(f"{event.address[0]}:{event.address[1]}", checkout_failures=1)
+
+    def connection_check_out_started(self, event)->None:
+        pass
+
+    def connection_ready(self, event)->None:
+        pass
+
+    def pool_created(self, event)->None:
+        pass
+
+    def pool_ready(self, event)->None:
+        pass
+
+    def pool_cleared(self, event)->None:
+        pass
+
+    def pool_closed(self, event)->None:
+        pass
+
+command_listener = CommandStatsListener()
+pool_listener = PoolStatsListener()
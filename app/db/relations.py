@@ -0,0 +1,33 @@
+from app.crud.crud import model_fields
+from app.db.database import db
+from app.models.role import Role
+from app.models.user import UserBase
+
+# Relaciones (campo, colección[, campos_a_poblar]) que se pueblan al leer cada recurso.
+# Los usuarios se proyectan a los campos de UserBase para no leer la contraseña, las áreas ni el rol de cada autor o aprobador.
+user_fields = model_fields(UserBase)
+# UserRead.role es un diccionario, por lo que el rol se proyecta a los campos de Role para no retornar sus campos de búsqueda.
+role_fields = model_fields(Role)
+
+chemical_relations = (
+    ("hazards", db.hazards),
+    ("ppes", db.ppes),
+    ("last_update_by", db.users, user_fields),
+)
+
+approval_relations = (
+    ("fsms.approbed_by", db.users, user_fields),
+    ("ems.approbed_by", db.users, user_fields),
+    ("ohsms.approbed_by", db.users, user_fields),
+)
+
+area_relations = (
+    ("chemicals", db.chemicals, "chemical"),
+    ("last_update_by", db.users, "username"),
+)
+
+user_relations = (
+    ("areas", db.areas, "area"),
+    ("role", db.roles, role_fields),
+    ("last_update_by", db.users, "username"),
+)
@@ -0,0 +1,124 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+import json
+import logging
+import random
+
+from bson import json_util
+from pymongo.errors import PyMongoError
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Solo se explican las lecturas: explain con executionStats ejecuta el plan completo y las escrituras no son necesarias para encontrar índices faltantes.
+explainable_commands = {"find", "aggregate", "count", "distinct"}
+query_fields = ("filter", "query", "pipeline", "sort", "projection", "key", "hint", "limit", "skip")
+# Campos de sesión y de clúster que agrega el driver y que explain no admite dentro del comando explicado.
+driver_fields = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+# Últimas operaciones lentas de este proceso, con el plan de las que se explicaron.
+slow_operations: deque = deque(maxlen=100)
+# Cola de las operaciones por explicar y el event loop que la consume. Los comandos terminan en hilos de Motor, por lo que se encolan con call_soon_threadsafe.
+explain_queue = {"loop": None, "queue": None}
+
+def command_query(command_name: str, command: dict)->dict:
+    """
+    Filtro, pipeline y opciones del comando, sin los documentos de las escrituras, en un formato serializable a JSON.
+    """
+    query = {field: command[field] for field in query_fields if field in command}
+    if command_name in ("update", "delete"):
+        query["filter"] = [statement.get("q") for statement in command.get(f"{command_name}s", [])[:5]]
+    return json.loads(json_util.dumps(query))
+
+def record_slow_operation(route: str | None, database_name: str, collection_name: str, command_name: str, command: dict, duration_ms: float)->None:
+    """
+    Registra el comando lento en el log y en slow_operations y, con probabilidad SLOW_OPERATION_EXPLAIN_RATE, lo encola para obtener su plan.
+    """
+    entry = {
+        "date": datetime.utcnow().isoformat(),
+        "route": route,
+        "collection": collection_name,
+        "command": command_name,
+        "duration_ms": round(duration_ms, 3),
+        "query": command_query(command_name, command),
+        "plan": None,
+    }
+    slow_operations.append(entry)
+    logger.warning("slow operation %s", json.dumps(entry))
+
+    loop, queue = explain_queue["loop"], explain_queue["queue"]
+    if loop is None or command_name not in explainable_commands or random.random() >= get_settings().SLOW_OPERATION_EXPLAIN_RATE:
+        return
+    explained_command = {key: value for key, value in command.items() if not key.startswith("$") and key not in driver_fields}
+    loop.call_soon_threadsafe(enqueue_explain, queue, (entry, database_name, explained_command))
+
+def enqueue_explain(queue: asyncio.Queue, item: tuple)->None:
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        pass
+
+def plan_stages(node)->list[str]:
+    """
+    Etapas del plan ganador, recorriendo inputStage, inputStages y queryPlan.
+    """
+    if isinstance(node, list):
+        return [stage for child in node for stage in plan_stages(child)]
+    if not isinstance(node, dict):
+        return []
+    stages = [node["stage"]] if "stage" in node else []
+    for key in ("inputStage", "inputStages", "queryPlan", "thenStage", "elseStage", "outerStage", "innerStage"):
+        stages.extend(plan_stages(node.get(key)))
+    return stages
+
+def find_key(document, key: str)->list:
+    """
+    Valores de la clave en cualquier nivel del documento. Las agregaciones anidan el plan de su primera etapa en stages.$cursor.
+    """
+    if isinstance(document, list):
+        return [value for item in document for value in find_key(item, key)]
+    if not isinstance(document, dict):
+        return []
+    values = [document[key]] if key in document else []
+    for value in document.values():
+        values.extend(find_key(value, key))
+    return values
+
+def plan_summary(explain: dict)->dict:
+    """
+    Resume la salida de explain: las etapas del plan ganador, si recorre la colección completa (COLLSCAN) y los documentos y claves examinados.
+    """
+    stages = plan_stages(find_key(explain, "winningPlan"))
+    execution_stats = (find_key(explain, "executionStats") or [{}])[0]
+    return {
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "docs_examined": execution_stats.get("totalDocsExamined"),
+        "keys_examined": execution_stats.get("totalKeysExamined"),
+        "returned": execution_stats.get("nReturned"),
+        "execution_ms": execution_stats.get("executionTimeMillis"),
+    }
+
+async def explain_slow_operations(client, maxsize: int = 20)->None:
+    """
+    Obtiene con explain("executionStats") el plan de las operaciones lentas encoladas y lo agrega a su registro. Las que recorren la colección completa se registran como advertencia.
+    """
+    queue = asyncio.Queue(maxsize=maxsize)
+    explain_queue.update(loop=asyncio.get_running_loop(), queue=queue)
+    try:
+        while True:
+            entry, database_name, command = await queue.get()
+            try:
+                explain = await client[database_name].command({"explain": command, "verbosity": "executionStats"})
+            except PyMongoError as error:
+                entry["plan"] = {"error": str(error)}
+                continue
+            entry["plan"] = plan_summary(explain)
+            if entry["plan"]["collscan"]:
+                logger.warning("COLLSCAN on %s from %s: %s", entry["collection"], entry["route"], json.dumps(entry["query"]))
+            else:
+                logger.info("slow operation plan %s", json.dumps(entry))
+    finally:
+        explain_queue.update(loop=None, queue=None)
@@ -0,0 +1,209 @@
+import asyncio
+import csv
+import io
+import json
+
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+
+from app.core.catalog import get_catalog, is_cataloged
+from app.core.config import get_settings
+from app.crud.crud import create_documents
+from app.db.database import db
+from app.helpers.helpers import get_approval_info, set_status, set_update_info
+from app.models.chemical import ChemicalCreate
+
+chemicals_collection = db.chemicals
+hazards_collection = db.hazards
+ppes_collection = db.ppes
+
+csv_list_fields = ["hazards", "ppes", "providers", "manufacturers", "sds"]
+csv_phrase_fields = ["p_phrases", "h_phrases"]
+upload_read_size = 64 * 1024
+utf8_bom = b"\xef\xbb\xbf"
+
+def validation_error_message(error: ValidationError | HTTPException)->str:
+    """
+    Resume en un texto los errores de validación de una fila.
+    """
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return "; ".join(f"{'.'.join(str(loc) for loc in item['loc'])}: {item['msg']}" for item in error.errors())
+
+def csv_row_to_chemical(row: dict)->dict:
+    """
+    Convierte una fila CSV en los datos de una sustancia química. Las listas se separan con "|" y las frases tienen la forma "código: descripción".
+    """
+    chemical = {"chemical": row.get("chemical")}
+    for field in csv_list_fields:
+        chemical[field] = [value.strip() for value in (row.get(field) or "").split("|") if value.strip()]
+    for field in csv_phrase_fields:
+        chemical[field] = [
+            dict(zip(("code", "description"), (part.strip() for part in value.split(":", 1))))
+            for value in (row.get(field) or "").split("|") if value.strip()
+        ]
+    return chemical
+
+async def existing_values(collection, field: str, values: list)->set:
+    """
+    Retorna, con una sola consulta $in o desde el catálogo en memoria, los valores del campo que ya existen en la colección.
+    """
+    if not values:
+        return set()
+    if field == "_id" and is_cataloged(collection):
+        return set((await get_catalog(collection.name)).get_many(values))
+    documents = await collection.find({field: {"$in": list(set(values))}}, {field: True}).to_list(None)
+    return {document[field] for document in documents}
+
+async def import_chemicals_chunk(rows: list, active_user: dict, first_index: int = 0)->list[dict]:
+    """
+    Valida y crea un lote de sustancias químicas. Retorna el resultado de cada fila.
+    """
+    results = {}
+    chemicals = {}
+    for index, row in enumerate(rows, start=first_index):
+        if isinstance(row, ValueError):
+            results[index] = {"index": index, "success": False, "error": str(row)}
+            continue
+        try:
+            chemicals[index] = ChemicalCreate.parse_obj(row).dict()
+        except (ValidationError, HTTPException) as error:
+            results[index] = {"index": index, "success": False, "error": validation_error_message(error)}
+
+    existing_chemicals, existing_hazards, existing_ppes = await asyncio.gather(
+        existing_values(chemicals_collection, "chemical", [chemical["chemical"] for chemical in chemicals.values()]),
+        existing_values(hazards_collection, "_id", [id for chemical in chemicals.values() for id in chemical["hazards"]]),
+        existing_values(ppes_collection, "_id", [id for chemical in chemicals.values() for id in chemical["ppes"]]),
+    )
+
+    approval_info = await get_approval_info()
+    seen_chemicals = set()
+    documents = {}
+    for index, chemical in chemicals.items():
+        missing_hazards = [id for id in chemical["hazards"] if id not in existing_hazards]
+        missing_ppes = [id for id in chemical["ppes"] if id not in existing_ppes]
+        query = {"chemical": chemical["chemical"]}
+        error = None
+        if chemical["chemical"] in existing_chemicals:
+            error = f"{query} ya se encuentra en la base de datos"
+        elif chemical["chemical"] in seen_chemicals:
+            error = f"{query} se encuentra repetido en la importación"
+        elif missing_hazards:
+            error = f"La información ingresada en el campo hazards no es válida. {missing_hazards[0]} no se encuentra en la base de datos."
+        elif missing_ppes:
+            error = f"La información ingresada en el campo ppes no es válida. {missing_ppes[0]} no se encuentra en la base de datos."
+        seen_chemicals.add(chemical["chemical"])
+        if error:
+            results[index] = {"index": index, "success": False, "error": error}
+            continue
+        chemical = set_status(chemical)
+        chemical = set_update_info(chemical, active_user)
+        chemical.update(approval_info)
+        documents[index] = chemical
+
+    inserted = await create_documents(list(documents.values()), chemicals_collection) if documents else []
+    for index, result in zip(documents.keys(), inserted):
+        if isinstance(result, dict):
+            results[index] = {"index": index, "success": False, "error": result.get("errmsg", "No se pudo crear el documento")}
+        else:
+            results[index] = {"index": index, "success": True, "id": result}
+
+    return [results[index] for index in sorted(results)]
+
+async def iter_rows(rows):
+    """
+    Recorre por igual una lista de filas o un iterable asíncrono, como el de read_upload_rows.
+    """
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+async def import_chemicals(rows, active_user: dict)->dict:
+    """
+    Importa sustancias químicas desde un iterable, o un iterable asíncrono, de filas, procesándolas por lotes de BULK_CHUNK_SIZE. Retorna el reporte de la importación.
+    """
+    results = []
+    chunk = []
+    async for row in iter_rows(rows):
+        chunk.append(row)
+        if len(chunk) == get_settings().BULK_CHUNK_SIZE:
+            results.extend(await import_chemicals_chunk(chunk, active_user, len(results)))
+            chunk = []
+    if chunk:
+        results.extend(await import_chemicals_chunk(chunk, active_user, len(results)))
+
+    created = sum(1 for result in results if result["success"])
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+def decode_line(line: bytes)->str | ValueError:
+    try:
+        return line.rstrip(b"\r").decode("utf-8")
+    except UnicodeDecodeError:
+        return ValueError("La fila no es texto UTF-8 válido")
+
+async def read_upload_lines(upload: UploadFile):
+    """
+    Recorre las líneas de un archivo subido leyéndolo por partes con upload.read(), sin bloquear el event loop ni cargarlo completo en memoria.
+    Las líneas que no son UTF-8 válido se entregan como ValueError.
+    """
+    buffer = b""
+    first_chunk = True
+    while chunk := await upload.read(upload_read_size):
+        if first_chunk:
+            chunk = chunk.removeprefix(utf8_bom)
+            first_chunk = False
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield decode_line(line)
+    if buffer:
+        yield decode_line(buffer)
+
+async def read_csv_rows(lines):
+    """
+    Agrupa las líneas en registros CSV, que pueden ocupar varias líneas si un valor entre comillas contiene saltos de línea, y los convierte en sustancias químicas usando la primera fila como encabezado.
+    """
+    header = None
+    record = []
+    async for line in lines:
+        if isinstance(line, ValueError):
+            record = []
+            yield line
+            continue
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            continue
+        record = []
+        values = next(csv.reader(io.StringIO(text, newline="")), [])
+        if not values:
+            continue
+        if header is None:
+            header = values
+            continue
+        yield csv_row_to_chemical(dict(zip(header, values)))
+    if record:
+        yield ValueError("La fila tiene comillas sin cerrar")
+
+async def read_upload_rows(upload: UploadFile):
+    """
+    Recorre las filas de un archivo CSV o NDJSON subido sin cargarlo completo en memoria. Las filas no válidas, incluidas las que no son UTF-8, se entregan como ValueError.
+    """
+    lines = read_upload_lines(upload)
+    if (upload.filename or "").lower().endswith(".csv") or upload.content_type == "text/csv":
+        async for row in read_csv_rows(lines):
+            yield row
+        return
+    async for line in lines:
+        if isinstance(line, ValueError):
+            yield line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            yield ValueError(f"La fila no es un JSON válido: {error.msg}")
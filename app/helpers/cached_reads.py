@@ -0,0 +1,42 @@
+from fastapi import Request, Response
+
+from app.core.response_cache import get_cached_response, set_cached_response
+from app.helpers.etag import etag_matches, not_modified
+from app.helpers.serialization import render_json
+
+def response_tags(collection, relations: tuple = ())->set:
+    """
+    Colecciones de las que depende una lectura: la colección leída y las de sus relaciones.
+    """
+    return {collection.name, *(relation[1].name for relation in relations)}
+
+def response_cache_key(request: Request, role: str | None)->tuple:
+    """
+    Clave de una respuesta: la ruta, sus parámetros y el rol del usuario que la solicita.
+    """
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())), role)
+
+def cached_read(request: Request, key: tuple)->Response | None:
+    """
+    Retorna la respuesta guardada para la clave, o 304 si el ETag guardado coincide con If-None-Match. Retorna None si no está en la caché.
+    """
+    entry = get_cached_response(key)
+    if entry is None:
+        return None
+    etag = entry["headers"].get("etag")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(entry["body"], media_type=entry["media_type"], headers=entry["headers"])
+
+def cache_read(key: tuple, tags: set, generations: tuple, content, model, response: Response)->Response:
+    """
+    Serializa el contenido, lo guarda en la caché con los encabezados de response y retorna la respuesta.
+    """
+    entry = {
+        "body": render_json(content, model),
+        "headers": dict(response.headers),
+        "media_type": "application/json",
+        "tags": tags,
+    }
+    set_cached_response(key, entry, generations)
+    return Response(entry["body"], media_type=entry["media_type"], headers=entry["headers"])
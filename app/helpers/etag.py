@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+
+from fastapi import Request, Response
+
+from app.core.catalog import get_catalog, is_cataloged
+from app.core.response_cache import cache_generations
+from app.crud.crud import build_query
+from app.models.enums import QueryStatus
+from app.models.py_object_id import PyObjectId
+
+async def last_update(collection, query: dict | None = None)->dict | None:
+    """
+    Obtiene el last_update_date más reciente de la colección usando su índice.
+    """
+    documents = await collection.find(query or {}, {"_id": False, "last_update_date": True}).sort("last_update_date", -1).limit(1).to_list(1)
+    return documents[0].get("last_update_date") if documents else None
+
+async def relations_version(relations: tuple)->list:
+    """
+    Obtiene la versión de cada colección relacionada: el last_update_date más reciente o, para los catálogos, su digest.
+    """
+    collections = {relation[1].name: relation[1] for relation in relations}
+    versions = await asyncio.gather(*[
+        get_catalog(name) if is_cataloged(collection) else last_update(collection)
+        for name, collection in sorted(collections.items())
+    ])
+    return [getattr(version, "digest", version) for version in versions]
+
+def make_etag(*parts)->str:
+    """
+    Construye un ETag fuerte a partir de las partes ingresadas.
+    """
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+async def list_etag(request: Request, collection, relations: tuple = (), status: QueryStatus = QueryStatus.all)->str:
+    """
+    ETag de un listado: depende de la ruta y sus parámetros, de la cantidad de documentos, del last_update_date más reciente de la colección y de sus relaciones
+    y de sus generaciones de escritura. Las generaciones cambian con las escrituras que no alteran la cantidad ni la fecha más reciente, como una edición con la misma fecha.
+    Son propias de cada proceso: las escrituras de otros workers solo las cambian con los flujos de cambio activos.
+    Sin filtro de estado, la cantidad se lee de los metadatos de la colección con estimated_document_count en lugar de contar los documentos.
+    """
+    query = build_query(status)
+    count, latest, related = await asyncio.gather(
+        collection.count_documents(query) if query else collection.estimated_document_count(),
+        last_update(collection),
+        relations_version(relations),
+    )
+    generations = cache_generations({collection.name, *(relation[1].name for relation in relations)})
+    return make_etag(request.url.path, sorted(request.query_params.multi_items()), count, latest, related, generations)
+
+async def document_etag(id: PyObjectId, collection, relations: tuple = ())->str | None:
+    """
+    ETag de un documento: depende de su last_update_date y de las versiones de sus relaciones. Retorna None si el documento no existe.
+    """
+    latest, related = await asyncio.gather(last_update(collection, {"_id": id}), relations_version(relations))
+    if latest is None:
+        return None
+    return make_etag(collection.name, id, latest, related)
+
+def etag_matches(request: Request, etag: str | None)->bool:
+    """
+    Indica si el encabezado If-None-Match de la solicitud incluye el ETag, con la comparación débil que define HTTP para este encabezado.
+    """
+    if etag is None:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def not_modified(etag: str)->Response:
+    """
+    Respuesta 304 sin contenido con el ETag vigente.
+    """
+    return Response(status_code=304, headers={"ETag": etag})
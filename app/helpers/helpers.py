@@ -1,70 +1,303 @@
+import asyncio
 from datetime import datetime
 import re
 import unicodedata
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from pydantic import BaseModel
-from app.crud.crud import get_document_by_id
+from app.core.catalog import get_catalog, is_cataloged
+from app.core.config import get_settings
+from app.core.principal import get_user_role
+from app.crud.crud import aggregate_documents, build_query, decode_cursor, encode_cursor, fields_projection, find_documents, get_document_by_id, iter_batches, utc_now
+from app.crud.pipelines import read_pipeline, relevance_score
 from app.db.database import db
 from app.models.approval import Approval
-from app.models.enums import ApprovalType
+from app.models.enums import ApprovalType, Pagination, QueryStatus, ReadEngine, SearchKeys
 from app.models.phrase import Phrase
 
 from app.models.py_object_id import PyObjectId
 
+def get_nested_container(document: dict, field: str)->tuple[dict | None, str]:
+    """
+    Retorna el diccionario que contiene el campo indicado y el nombre del campo. Admite rutas con puntos, por ejemplo "fsms.approbed_by".
+    """
+    *path, key = field.split(".")
+    for step in path:
+        document = document.get(step) if type(document) is dict else None
+    return (document if type(document) is dict else None), key
+
+async def load_by_ids(ids: list, collection, field_to_populate: str | tuple[str, ...] | None = None)->dict:
+    """
+    Obtiene con una sola consulta $in los documentos de los MongoID ingresados, o del catálogo en memoria si la colección tiene uno. Retorna un diccionario de la forma {id: documento}.
+    Si se ingresa un campo o una tupla de campos, los documentos solo incluyen esos campos y el MongoID.
+    """
+    ids = list({id for id in ids if id is not None})
+    if not ids:
+        return {}
+    projection = fields_projection(field_to_populate)
+    if is_cataloged(collection):
+        items = (await get_catalog(collection.name)).get_many(ids)
+        if projection:
+            items = {id: {"_id": id, **{field: item.get(field) for field in projection}} for id, item in items.items()}
+        return items
+    documents = await collection.find({"_id": {"$in": ids}}, projection).to_list(None)
+    return {document["_id"]: document for document in documents}
+
+async def populate_many(documents: list, *relations: tuple)->list:
+    """
+    Remplaza los MongoID anidados de varios campos en una lista de documentos. Cada relación es una tupla de la forma (campo, colección) o (campo, colección, campos_a_poblar),
+    donde campos_a_poblar es un campo o una tupla de campos, por ejemplo model_fields(UserBase).
+    Reúne todos los MongoID de todos los documentos, realiza una consulta por colección y ejecuta las consultas concurrentemente.
+    """
+    requests = {}
+    for relation in relations:
+        field_with_nested_ids, collection, field_to_populate = (*relation, None)[:3]
+        request = requests.setdefault((collection.name, field_to_populate), {"collection": collection, "ids": []})
+        for document in documents:
+            container, key = get_nested_container(document, field_with_nested_ids)
+            if container is None:
+                continue
+            field = container.get(key)
+            request["ids"].extend(field if type(field) is list else [field])
+
+    loaded = await asyncio.gather(*[
+        load_by_ids(request["ids"], request["collection"], field_to_populate)
+        for (_, field_to_populate), request in requests.items()
+    ])
+    items_by_request = dict(zip(requests.keys(), loaded))
+
+    for relation in relations:
+        field_with_nested_ids, collection, field_to_populate = (*relation, None)[:3]
+        items = items_by_request[(collection.name, field_to_populate)]
+        for document in documents:
+            container, key = get_nested_container(document, field_with_nested_ids)
+            if container is None:
+                continue
+            field = container.get(key)
+            if type(field) is list:
+                container[key] = [items[nested_id] for nested_id in field if nested_id in items]
+            else:
+                container[key] = items.get(field)
+
+    return documents
+
 async def populate(
     dict_to_populate: dict,
     field_with_nested_ids: str,
     collection,
-    field_to_populate: str | None = None,
+    field_to_populate: str | tuple[str, ...] | None = None,
 )->dict:
     """
     Remplaza los MongoID aninados en un lista por un diccionario de la forma {"id": id, "valor": valor} para un documento.
     """
-    field: list | PyObjectId = dict_to_populate[field_with_nested_ids]
-  
-    if type(field) is list:
-        populated_items = []
-        for nested_id in field:
-            item = await collection.find_one({"_id": nested_id})
-            if not field_to_populate:
-                populated_items.append(item)
-            if field_to_populate:
-                populated_items.append(
-                    {"_id": nested_id, field_to_populate: item[field_to_populate]}
-                )
-        
-        dict_to_populate.update({field_with_nested_ids: populated_items})
-    
-    else:
-        item = await collection.find_one({"_id": field})      
-        if not field_to_populate:
-            populated_item = item
-        if field_to_populate:
-            populated_item = {"_id": field, field_to_populate: item[field_to_populate]}      
-        
-        dict_to_populate.update({field_with_nested_ids: populated_item})
-        
+    await populate_many([dict_to_populate], (field_with_nested_ids, collection, field_to_populate))
     return dict_to_populate
 
 async def multiple_populate(
     documents: list,
     field_with_nested_ids: str,
     collection,
-    field_to_populate: str | None = None,
+    field_to_populate: str | tuple[str, ...] | None = None,
 ):
     """
     Remplaza los MongoID aninados en una lista por un diccionario de la forma {"id": id, "valor": valor} para varios documentos en una lista.
     """
-    try:
-        documents = [
-            await populate(
-                document, field_with_nested_ids, collection, field_to_populate
-            )
-            for document in documents
-        ]
-        return documents
-    except:
-        return documents
+    return await populate_many(documents, (field_with_nested_ids, collection, field_to_populate))
+
+def split_relations(relations: tuple)->tuple[tuple, tuple]:
+    """
+    Separa las relaciones que se resuelven con $lookup de las que se pueblan desde el catálogo en memoria.
+    """
+    lookups = tuple(relation for relation in relations if not is_cataloged(relation[1]))
+    cataloged = tuple(relation for relation in relations if is_cataloged(relation[1]))
+    return lookups, cataloged
+
+def read_cursor(
+    collection,
+    relations: tuple = (),
+    engine: ReadEngine = ReadEngine.populate,
+    skip: int = 0,
+    limit: int | None = None,
+    status: QueryStatus = QueryStatus.all,
+    query_keys: SearchKeys | None = None,
+    query_value: str | None = None,
+    pagination: Pagination = Pagination.offset,
+    cursor: str | None = None,
+    relevance: bool = False,
+)->tuple:
+    """
+    Construye el cursor de Motor de una lectura. Retorna el cursor y las relaciones que aún se deben poblar, solo las de catálogos si se utiliza la agregación.
+    Con paginación por cursor, los documentos se ordenan por MongoID y la página inicia después del cursor ingresado, sin importar el salto de página.
+    Con relevancia, los resultados de una búsqueda paginada por salto de página se ordenan de más a menos relevante.
+    """
+    after = None
+    sort = None
+    if pagination == Pagination.cursor:
+        skip = 0
+        after = decode_cursor(cursor) if cursor else None
+        sort = [("_id", 1)]
+
+    computed_fields = None
+    if relevance and query_keys and query_value and pagination == Pagination.offset:
+        computed_fields = {"__score": relevance_score(query_keys, query_value)}
+        sort = [("__score", -1), ("_id", 1)]
+
+    if engine == ReadEngine.aggregation or computed_fields:
+        query = build_query(status, query_keys, query_value, after)
+        lookups, pending_relations = split_relations(relations) if engine == ReadEngine.aggregation else ((), relations)
+        return collection.aggregate(read_pipeline(lookups, query, skip, limit, sort, computed_fields)), pending_relations
+
+    return find_documents(collection, skip, limit, status, query_keys, query_value, after, sort), relations
+
+async def read_documents(
+    collection,
+    relations: tuple = (),
+    engine: ReadEngine = ReadEngine.populate,
+    skip: int = 0,
+    limit: int | None = None,
+    status: QueryStatus = QueryStatus.all,
+    query_keys: SearchKeys | None = None,
+    query_value: str | None = None,
+    pagination: Pagination = Pagination.offset,
+    cursor: str | None = None,
+    relevance: bool = False,
+)->list:
+    """
+    Obtiene los documentos de una colección con sus relaciones pobladas, ya sea con consultas $in por relación o con una sola agregación.
+    Los parámetros son los de read_cursor.
+    """
+    documents_cursor, pending_relations = read_cursor(collection, relations, engine, skip, limit, status, query_keys, query_value, pagination, cursor, relevance)
+    documents = await documents_cursor.to_list(None)
+    return await populate_many(documents, *pending_relations)
+
+def iter_documents(
+    collection,
+    relations: tuple = (),
+    engine: ReadEngine = ReadEngine.populate,
+    skip: int = 0,
+    limit: int | None = None,
+    status: QueryStatus = QueryStatus.all,
+    query_keys: SearchKeys | None = None,
+    query_value: str | None = None,
+    pagination: Pagination = Pagination.offset,
+    cursor: str | None = None,
+    relevance: bool = False,
+):
+    """
+    Igual que read_documents, pero entrega los documentos poblados por lotes de STREAM_BATCH_SIZE para no cargar toda la colección en memoria.
+    """
+    documents_cursor, pending_relations = read_cursor(collection, relations, engine, skip, limit, status, query_keys, query_value, pagination, cursor, relevance)
+    return populate_batches(documents_cursor, pending_relations)
+
+async def populate_batches(documents_cursor, relations: tuple = ()):
+    """
+    Recorre un cursor por lotes y puebla las relaciones de cada lote.
+    """
+    async for batch in iter_batches(documents_cursor, get_settings().STREAM_BATCH_SIZE):
+        yield await populate_many(batch, *relations)
+
+def set_next_cursor(response: Response, documents: list, pagination: Pagination, limit: int | None)->None:
+    """
+    Agrega el encabezado X-Next-Cursor cuando la página está completa y puede existir una página siguiente.
+    """
+    if pagination == Pagination.cursor and limit and len(documents) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1]["_id"])
+
+async def read_document(
+    id: PyObjectId,
+    collection,
+    relations: tuple = (),
+    engine: ReadEngine = ReadEngine.populate,
+)->dict:
+    """
+    Obtiene el documento del ID ingresado con sus relaciones pobladas.
+    """
+    if engine == ReadEngine.aggregation:
+        lookups, cataloged = split_relations(relations)
+        documents = await aggregate_documents(collection, read_pipeline(lookups, {"_id": id}, limit=1))
+        await populate_many(documents, *cataloged)
+        return documents[0]
+
+    document = await get_document_by_id(id, collection)
+    await populate_many([document], *relations)
+    return document
+
+def duplicate_validation(collection, data_in: BaseModel, field_to_validate: str)->dict:
+    """
+    Crea una validación que falla si el valor del campo ya se encuentra en la colección.
+    """
+    return {
+        "collection": collection,
+        "field_to_validate": field_to_validate,
+        "value": data_in.dict()[field_to_validate],
+        "check_duplicate": True,
+    }
+
+def reference_validation(
+    collection,
+    data_in: BaseModel | None = None,
+    field_to_validate: str | None = None,
+    query_value: PyObjectId | None = None,
+    )->dict:
+    """
+    Crea una validación que falla si el MongoID ingresado, o alguno de los MongoID del campo, no se encuentra en la colección.
+    """
+    return {
+        "collection": collection,
+        "field_to_validate": field_to_validate,
+        "value": query_value if query_value else data_in.dict()[field_to_validate],
+        "check_duplicate": False,
+    }
+
+async def run_validations(*validations: dict)->None:
+    """
+    Resuelve todas las validaciones de una solicitud con una consulta por colección, ejecutadas concurrentemente. Las referencias a catálogos se validan en memoria.
+    Lanza el error de la primera validación que falle, en el orden en el que se ingresaron.
+    """
+    queries = {}
+    cataloged_ids = {}
+    for validation in validations:
+        collection = validation["collection"]
+        field_to_validate = validation["field_to_validate"]
+        value = validation["value"]
+        if is_cataloged(collection) and not validation["check_duplicate"]:
+            cataloged_ids[collection.name] = (await get_catalog(collection.name)).by_id
+            continue
+        query = queries.setdefault(collection.name, {"collection": collection, "clauses": [], "projection": {"_id": True}})
+        if validation["check_duplicate"]:
+            if value is not None:
+                query["clauses"].append({field_to_validate: value})
+                query["projection"][field_to_validate] = True
+        else:
+            ids = [id for id in (value if type(value) is list else [value]) if id]
+            if ids:
+                query["clauses"].append({"_id": {"$in": ids}})
+
+    queries = {name: query for name, query in queries.items() if query["clauses"]}
+    results = await asyncio.gather(*[
+        query["collection"].find({"$or": query["clauses"]}, query["projection"]).to_list(None)
+        for query in queries.values()
+    ])
+    documents_by_collection = dict(zip(queries.keys(), results))
+
+    for validation in validations:
+        documents = documents_by_collection.get(validation["collection"].name, [])
+        field_to_validate = validation["field_to_validate"]
+        value = validation["value"]
+
+        if validation["check_duplicate"]:
+            query = {field_to_validate: value}
+            if value is not None and any(document.get(field_to_validate) == value for document in documents):
+                raise HTTPException(status_code=400, detail=f"{query} ya se encuentra en la base de datos")
+            continue
+
+        found_ids = cataloged_ids.get(validation["collection"].name, {document["_id"] for document in documents})
+        if type(value) is list:
+            missing_ids = [nested_id for nested_id in value if nested_id not in found_ids]
+            if missing_ids:
+                raise HTTPException(status_code=400, detail=f"La información ingresada en el campo {field_to_validate} no es válida. {missing_ids[0]} no se encuentra en la base de datos.")
+        elif value and value not in found_ids:
+            query = {"_id": value}
+            raise HTTPException(status_code=400, detail=f"La información ingresada en el campo {field_to_validate} no es válida. {query} no se encuentra en la base de datos.")
 
 async def db_validation(*,
     data_in: BaseModel | None = None,
@@ -77,18 +310,10 @@ async def db_validation(*,
     """
     Verifica que los campos con Mongo IDs no sean duplicados o tengan un valor válido, depediendo si el parámetro check_duplicate es True o False.
     """
-    if not query_value:
-        query_value = data_in.dict()[field_to_validate]
-
-    query = {"_id": query_value} if search_id else {field_to_validate: query_value}
-    
-    result = await collection.find_one(query)
-
-    if check_duplicate and result:
-            raise HTTPException(status_code=400, detail=f"{query} ya se encuentra en la base de datos")
-
-    if query_value and not check_duplicate and not result:
-        raise HTTPException(status_code=400, detail=f"La información ingresada en el campo {field_to_validate} no es válida. {query} no se encuentra en la base de datos.")
+    if check_duplicate:
+        await run_validations(duplicate_validation(collection, data_in, field_to_validate))
+    else:
+        await run_validations(reference_validation(collection, data_in, field_to_validate, query_value))
 
 async def multiple_db_validation(
     data_in: BaseModel,
@@ -98,17 +323,7 @@ async def multiple_db_validation(
     """
     Verifica en un iterable que los con Mongo IDs en el campo iterable tengan un valor que exista en la base de datos.
     """
-    list_to_populate = data_in.dict()[field_to_validate]
-
-    if type(list_to_populate) is list and len(list_to_populate) > 0:
-        try:
-            for nested_id in list_to_populate:
-                await db_validation(
-                    data_in=data_in, field_to_validate=field_to_validate,
-                    collection=collection, check_duplicate=False,
-                    search_id=True, query_value=nested_id)
-        except:
-            raise HTTPException(status_code=400, detail=f"La información ingresada en el campo {field_to_validate} no es válida. {nested_id} no se encuentra en la base de datos.")
+    await run_validations(reference_validation(collection, data_in, field_to_validate))
 
 def text_normalizer_title(text:str)->str:
     """
@@ -130,10 +345,10 @@ def text_normalizer_lower(text:str)->str:
 
 def drop_duplicates(input: list)->list:
     """
-    Elimina los elementos duplicados en los campos tipo lista o tupla.
+    Elimina los elementos duplicados en los campos tipo lista o tupla, conservando el orden.
     """
     try: 
-        input = list(set(input))
+        input = list(dict.fromkeys(input))
     finally :
         return input
 
@@ -163,7 +378,7 @@ def h_phrase_code_normalizer(h_phrase: Phrase)->dict:
 
 def set_update_info(item: dict | BaseModel, user: dict)->dict:
     item = item.dict() if type(item) is not dict else item
-    item["last_update_date"] = datetime.utcnow()
+    item["last_update_date"] = utc_now()
     item["last_update_by"] = user["_id"]
     return item
 
@@ -173,8 +388,10 @@ async def drop_inactive_nested_ids(item: dict | BaseModel,field_to_process , col
     """
     item = item.dict() if type(item) is not dict else item
     field_list = item[field_to_process]
-    field_list = [id for id in field_list if (await collection.find_one({"_id": id}))["status"]]
-    item[field_to_process] = field_list
+    if field_list:
+        active_documents = await collection.find({"_id": {"$in": field_list}, "status": True}, {"_id": True}).to_list(None)
+        active_ids = {document["_id"] for document in active_documents}
+        item[field_to_process] = [id for id in field_list if id in active_ids]
     return item
 
 
@@ -193,7 +410,7 @@ async def get_approval_info(approver: dict | None = None, approval_type: Approva
         approval_info[ApprovalType.ohsms] = empty_approval
 
     if approver:
-        approver_role = dict(await get_document_by_id(approver["role"], db.roles))["role"]
+        approver_role = await get_user_role(approver)
         approver_id = approver["_id"]
 
         if approval_type == ApprovalType.ems:
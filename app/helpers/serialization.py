@@ -0,0 +1,156 @@
+from functools import lru_cache
+import json
+
+from bson import ObjectId
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+import orjson
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+from app.core.config import get_settings
+
+class ShapeError(ValueError):
+    """
+    El documento no tiene la forma que espera el modelo de respuesta.
+    """
+
+def encode_default(value):
+    """
+    Convierte los tipos que orjson no serializa por sí mismo, igual que los json_encoders de los modelos.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dump_json(content)->bytes:
+    """
+    Convierte el contenido en JSON compacto UTF-8, con el mismo resultado que JSONResponse de Starlette.
+    """
+    return orjson.dumps(content, default=encode_default)
+
+def value_shaper(field: ModelField):
+    """
+    Construye la función que da forma al valor de un campo: los modelos anidados se recortan a sus campos, las uniones prueban cada tipo en orden y el resto de valores se conserva.
+    """
+    allow_none = field.allow_none
+    if field.shape == SHAPE_LIST:
+        item_shaper = value_shaper(field.sub_fields[0])
+        def shape(value):
+            if value is None and allow_none:
+                return None
+            if type(value) not in (list, tuple):
+                raise ShapeError(field.name)
+            return [item_shaper(item) for item in value]
+        return shape
+
+    if field.shape != SHAPE_SINGLETON:
+        raise TypeError(f"Unsupported field shape for {field.name}")
+
+    if field.sub_fields:
+        shapers = [value_shaper(sub_field) for sub_field in field.sub_fields]
+        def shape(value):
+            if value is None and allow_none:
+                return None
+            for shaper in shapers:
+                try:
+                    return shaper(value)
+                except ShapeError:
+                    continue
+            raise ShapeError(field.name)
+        return shape
+
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        model_shape = document_shaper(field.type_)
+        def shape(value):
+            if value is None and allow_none:
+                return None
+            if type(value) is not dict:
+                raise ShapeError(field.name)
+            return model_shape(value)
+        return shape
+
+    expected_type = dict if field.type_ is dict else None
+    def shape(value):
+        if value is None:
+            if allow_none:
+                return None
+            raise ShapeError(field.name)
+        if expected_type is not None and type(value) is not expected_type:
+            raise ShapeError(field.name)
+        return value
+    return shape
+
+@lru_cache(maxsize=None)
+def document_shaper(model: type[BaseModel]):
+    """
+    Construye, una vez por modelo, la función que deja en un documento solo los campos del modelo, en su orden y con sus alias, sin volver a validarlos.
+    """
+    fields = [
+        (field.alias, field.name, field.required, field, value_shaper(field))
+        for field in model.__fields__.values()
+    ]
+    def shape(document: dict)->dict:
+        shaped = {}
+        for alias, name, required, field, shaper in fields:
+            if alias in document:
+                value = document[alias]
+            elif name in document:
+                value = document[name]
+            elif required:
+                raise ShapeError(alias)
+            else:
+                value = field.get_default()
+                if isinstance(value, BaseModel):
+                    value = value.dict(by_alias=True)
+            shaped[alias] = shaper(value)
+        return shaped
+    return shape
+
+def shape_document(document: dict, model: type[BaseModel]):
+    """
+    Da forma a un documento según el modelo de respuesta. Si el documento no corresponde al modelo, lo valida con pydantic como lo haría FastAPI.
+    """
+    try:
+        return document_shaper(model)(document)
+    except ShapeError:
+        return jsonable_encoder(model.parse_obj(document))
+
+def fast_json(content, model: type[BaseModel])->bytes:
+    """
+    Serializa con orjson el documento, o la lista de documentos, sin pasar por la validación del response_model.
+    """
+    if type(content) in (list, tuple):
+        return dump_json([shape_document(document, model) for document in content])
+    return dump_json(shape_document(content, model))
+
+def validated_json(content, model: type[BaseModel])->bytes:
+    """
+    Serializa el documento, o la lista de documentos, validándolos con el modelo igual que FastAPI con el response_model.
+    """
+    if type(content) in (list, tuple):
+        encoded = [jsonable_encoder(model.parse_obj(document)) for document in content]
+    else:
+        encoded = jsonable_encoder(model.parse_obj(content))
+    return json.dumps(encoded, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def render_json(content, model: type[BaseModel])->bytes:
+    """
+    Serializa el contenido por la ruta rápida si FAST_JSON_RESPONSES está activo y, si no, por la validada. Ambas producen los mismos bytes.
+    """
+    return fast_json(content, model) if get_settings().FAST_JSON_RESPONSES else validated_json(content, model)
+
+def fast_json_response(content, model: type[BaseModel], response: Response | None = None)->Response:
+    """
+    Retorna el documento, o la lista de documentos, serializado con orjson sin pasar por la validación del response_model. Conserva los encabezados agregados a response.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return Response(fast_json(content, model), media_type="application/json", headers=headers)
+
+def read_response(content, model: type[BaseModel], response: Response | None = None):
+    """
+    Retorna el contenido para que FastAPI lo valide con el response_model o, si FAST_JSON_RESPONSES está activo, la respuesta ya serializada con fast_json_response.
+    """
+    if not get_settings().FAST_JSON_RESPONSES:
+        return content
+    return fast_json_response(content, model, response)
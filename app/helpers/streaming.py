@@ -0,0 +1,50 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+from app.helpers.serialization import dump_json, shape_document
+from app.models.enums import ResponseFormat
+
+media_types = {
+    ResponseFormat.ndjson: "application/x-ndjson",
+    ResponseFormat.json_stream: "application/json",
+}
+
+def serialize_document(document: dict, model: type[BaseModel])->str:
+    """
+    Valida un documento con el modelo de respuesta y lo convierte en JSON igual que FastAPI. Con FAST_JSON_RESPONSES solo le da forma y lo serializa con orjson.
+    """
+    if get_settings().FAST_JSON_RESPONSES:
+        return dump_json(shape_document(document, model)).decode()
+    content = jsonable_encoder(model.parse_obj(document))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+async def serialize_batches(batches, model: type[BaseModel], response_format: ResponseFormat):
+    """
+    Convierte cada lote de documentos en un fragmento NDJSON o en una parte de un arreglo JSON.
+    """
+    if response_format == ResponseFormat.json_stream:
+        yield "["
+
+    first = True
+    async for batch in batches:
+        items = [serialize_document(document, model) for document in batch]
+        if response_format == ResponseFormat.ndjson:
+            yield "".join(item + "\n" for item in items)
+            continue
+        chunk = ",".join(items)
+        if chunk:
+            yield chunk if first else "," + chunk
+            first = False
+
+    if response_format == ResponseFormat.json_stream:
+        yield "]"
+
+def stream_response(batches, model: type[BaseModel], response_format: ResponseFormat, headers: dict | None = None)->StreamingResponse:
+    """
+    Retorna una respuesta que envía los documentos al cliente a medida que se leen de la base de datos.
+    """
+    return StreamingResponse(serialize_batches(batches, model, response_format), media_type=media_types[response_format], headers=headers)
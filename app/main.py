@@ -1,3 +1,7 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+import logging
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -8,7 +12,15 @@ from app.routers.areas import areas
 from app.routers.chemicals import chemicals
 from app.routers.users import users
 from app.routers.search import search
+from app.routers.metrics import metrics
+from app.core.catalog import load_catalogs
 from app.core.config import get_settings
+from app.core.instrumentation import RequestInstrumentationMiddleware
+from app.core.profiler import ProfilerMiddleware
+from app.db.change_stream import refresh_catalogs, watch_changes
+from app.db.database import client, close_database, connect_database
+from app.db.indexes import ensure_indexes
+from app.db.slow_operations import explain_slow_operations
 
 description = """
     Administre las sustancias químicas que se utilizan en su empresa
@@ -36,6 +48,34 @@ tags_metadata = [
 ]
 
 
+logger = logging.getLogger(__name__)
+
+# Opens the database connection, creates the declared indexes and loads the in-memory catalogs (hazards, ppes, roles)
+# before serving requests. Then follows the database changes to invalidate the local caches, or only refreshes the
+# catalogs if change streams are disabled, and explains a sample of the slow operations. Closes the connection on shutdown.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await connect_database()
+    for collection_name, report in (await ensure_indexes()).items():
+        if report["created"]:
+            logger.info("%s: created indexes %s", collection_name, ", ".join(report["created"]))
+        if report["extra"]:
+            logger.warning("%s: indexes not declared in app.db.indexes: %s", collection_name, ", ".join(report["extra"]))
+        for name, error in report["errors"].items():
+            logger.error("%s: could not create index %s: %s", collection_name, name, error)
+    await load_catalogs()
+    tasks = [
+        asyncio.create_task(watch_changes() if get_settings().CHANGE_STREAMS_ENABLED else refresh_catalogs()),
+        asyncio.create_task(explain_slow_operations(client)),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    close_database()
+
+
 app = FastAPI(
     title="Chem Manager",
     description=description,
@@ -50,13 +90,16 @@ app = FastAPI(
         "name": "Apache 2.0",
         "url": "https://www.apache.org/licenses/LICENSE-2.0.html",
     },
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    lifespan=lifespan
 )
 
 app.include_router(users)
 app.include_router(chemicals)
 app.include_router(areas)
 app.include_router(search)
+if get_settings().METRICS_ENABLED:
+    app.include_router(metrics)
 
 #For serving static Files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -77,8 +120,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cascade-Count", "ETag", "Server-Timing", "X-Profile-Id"],
 )
 
+# Counts and times the Mongo commands of each request (Server-Timing header and a JSON log line per request)
+# and records the per-route metrics served at /metrics
+app.add_middleware(RequestInstrumentationMiddleware)
+
+# Samples the stacks of an admin request sent with X-Profile or ?profile= (folded profile inline or stored in PROFILE_DIR)
+if get_settings().PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
 
 # Jinja template serve path operation
 @app.get("/", status_code=200, include_in_schema=False)
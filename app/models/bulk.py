@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from bson import ObjectId
+
+from app.models.py_object_id import PyObjectId
+
+class BulkRowResult(BaseModel):
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+    index: int = Field(..., title="Fila", description="Posición de la fila en el archivo o arreglo, iniciando en 0")
+    success: bool
+    id: PyObjectId | None = Field(None, title="ID", description="MongoID del documento creado")
+    error: str | None = Field(None, title="Error", description="Motivo por el que no se creó el documento")
+
+class BulkReport(BaseModel):
+
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+    created: int
+    failed: int
+    results: list[BulkRowResult]
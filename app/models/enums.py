@@ -24,4 +24,17 @@ class Collections(str, Enum):
     hazards = "hazards"
     ppes = "ppes"
     roles = "roles"
-    users = "users"
\ No newline at end of file
+    users = "users"
+
+class ReadEngine(str, Enum):
+    populate = "populate"
+    aggregation = "aggregation"
+
+class Pagination(str, Enum):
+    offset = "offset"
+    cursor = "cursor"
+
+class ResponseFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+    json_stream = "json_stream"
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, Query, Path, Body
+from fastapi import APIRouter, Depends, Query, Path, Body, Response, Request
 
 from app.core.auth import get_current_user, validate_area_auth, validate_role
-from app.crud.crud import create_document, delete_restore_document, get_document_by_id, get_documents, update_document
+from app.core.principal import get_user_role, invalidate_area
+from app.core.response_cache import cache_generations
+from app.crud.crud import create_document, delete_restore_document, update_document
 from app.db.database import db
-from app.helpers.helpers import db_validation, drop_inactive_nested_ids, multiple_db_validation, multiple_populate, populate, set_status, set_update_info
+from app.db.relations import area_relations
+from app.helpers.cached_reads import cache_read, cached_read, response_cache_key, response_tags
+from app.helpers.etag import document_etag, etag_matches, list_etag, not_modified
+from app.helpers.helpers import db_validation, drop_inactive_nested_ids, duplicate_validation, populate_many, iter_documents, read_document, read_documents, reference_validation, run_validations, set_next_cursor, set_status, set_update_info
+from app.helpers.serialization import read_response
+from app.helpers.streaming import stream_response
 from app.models.area import AreaCreate, AreaRead, AreaUpdate
-from app.models.enums import QueryStatus
+from app.models.enums import Pagination, QueryStatus, ReadEngine, ResponseFormat
 from app.models.py_object_id import PyObjectId
 
 areas = APIRouter(prefix="/areas", tags=["Áreas"])
@@ -14,34 +21,62 @@ areas_collection = db.areas
 chemicals_collection = db.chemicals
 users_collection = db.users
 
-@areas.get('/', name="Obtener áreas", response_model=list[AreaRead], status_code=200, dependencies=[Depends(get_current_user)])
+@areas.get('/', name="Obtener áreas", response_model=list[AreaRead], status_code=200)
 async def get_areas(
+    request: Request,
+    response: Response,
     skip: int = Query(0, title="Salto de página", description="Índica desde el cual número de documento inicia la consulta a la base de datos"),
     limit: int | None = Query(None, title="Límite", description="Índica la cantidad máxima que obtendrá la consulta a la Base de Datos"),
     status: QueryStatus = Query(QueryStatus.all, title="Estado", description="Determina si se requiere que la consulta obtenga las áreas activas, inactivas o todas"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
+    pagination: Pagination = Query(Pagination.offset, title="Paginación", description="Determina si la consulta se pagina con salto de página (offset) o con cursor (cursor). Con cursor, el siguiente cursor se retorna en el encabezado X-Next-Cursor"),
+    cursor: str | None = Query(None, title="Cursor", description="Cursor retornado en el encabezado X-Next-Cursor de la página anterior"),
+    response_format: ResponseFormat = Query(ResponseFormat.json, title="Formato", description="Determina si la respuesta se envía completa (json) o por partes a medida que se lee la base de datos, como NDJSON (ndjson) o como un arreglo JSON (json_stream)"),
+    active_user = Depends(get_current_user),
     )->list:
     """
     Obtiene todas las áreas en la base de datos.
     """
-    areas = await get_documents(areas_collection, skip, limit, status)
-    areas = await multiple_populate(areas, "chemicals", chemicals_collection, "chemical")
-    areas = await multiple_populate(areas, "last_update_by", users_collection, "username")
+    cache_key = response_cache_key(request, await get_user_role(active_user))
+    if response_format == ResponseFormat.json:
+        cached = cached_read(request, cache_key)
+        if cached:
+            return cached
+    tags = response_tags(areas_collection, area_relations)
+    generations = cache_generations(tags)
 
-    return areas
+    etag = await list_etag(request, areas_collection, area_relations, status)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    if response_format != ResponseFormat.json:
+        batches = iter_documents(areas_collection, area_relations, engine, skip, limit, status, pagination=pagination, cursor=cursor)
+        return stream_response(batches, AreaRead, response_format, {"ETag": etag})
+
+    areas = await read_documents(areas_collection, area_relations, engine, skip, limit, status, pagination=pagination, cursor=cursor)
+    set_next_cursor(response, areas, pagination, limit)
+
+    return cache_read(cache_key, tags, generations, areas, AreaRead, response)
 
 @areas.get('/{id}',name="Obtener áreas", response_model=AreaRead, status_code=200, dependencies=[Depends(get_current_user)])
 async def get_chemical(
+    request: Request,
+    response: Response,
     id: PyObjectId = Path(..., title="ID del área", description="El MongoID del área a buscar"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
     )->dict:
     """
     Obtiene área correspondiente al ID ingresado.
     """
+    etag = await document_etag(id, areas_collection, area_relations)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     await db_validation(collection=areas_collection, check_duplicate=False, search_id=True, query_value=id)
-    area = await get_document_by_id(id, areas_collection)
-    area = await populate(area, "chemicals", chemicals_collection, "chemical")
-    area = await populate(area, "last_update_by", users_collection, "username")
+    area = await read_document(id, areas_collection, area_relations, engine)
 
-    return area
+    response.headers["ETag"] = etag
+    return read_response(area, AreaRead, response)
 
 @areas.post('/',name="Crear área", response_model=AreaRead, status_code=201)
 async def create_chemical(
@@ -52,14 +87,15 @@ async def create_chemical(
     Crea una área. Retorna el área creada.
     """
     await validate_role(active_user)
-    await db_validation(data_in= area, field_to_validate="area", collection=areas_collection)
-    await multiple_db_validation(data_in= area, field_to_validate="chemicals", collection=chemicals_collection)
+    await run_validations(
+        duplicate_validation(areas_collection, area, "area"),
+        reference_validation(chemicals_collection, area, "chemicals"),
+    )
     area = set_status(area)
     area = set_update_info(area, active_user)
     area = await drop_inactive_nested_ids(area, "chemicals", chemicals_collection)
     new_area = await create_document(area, areas_collection)
-    new_area = await populate(new_area, "chemicals", chemicals_collection, "chemical")
-    new_area = await populate(new_area, "last_update_by", users_collection, "username")
+    await populate_many([new_area], *area_relations)
     return new_area
 
 @areas.put('/{id}',name="Actualizar área", response_model=AreaRead, status_code=202)
@@ -72,24 +108,27 @@ async def update_chemical(
     Actualiza los datos del área del ID ingresado. Retorna el área actualizada.
     """
     await validate_area_auth(active_user, id)
-    await db_validation(collection=areas_collection, check_duplicate=False, search_id=True, query_value=id)
-    await db_validation(data_in=new_data, field_to_validate= "area", collection= areas_collection)
-    await multiple_db_validation(data_in=new_data, field_to_validate="chemicals", collection=chemicals_collection)
+    await run_validations(
+        reference_validation(areas_collection, query_value=id),
+        duplicate_validation(areas_collection, new_data, "area"),
+        reference_validation(chemicals_collection, new_data, "chemicals"),
+    )
     new_data = set_update_info(new_data, active_user)
     new_data = await drop_inactive_nested_ids(new_data, "chemicals", chemicals_collection)
     updated_area = await update_document(id, areas_collection, new_data)    
-    updated_area = await populate(updated_area, "chemicals", chemicals_collection, "chemical")
-    updated_area = await populate(updated_area, "last_update_by", users_collection, "username")
+    await populate_many([updated_area], *area_relations)
     return updated_area
 
-@areas.delete("(/{id}", name="Eliminar o restaurar área", response_model=AreaRead, status_code=200)
-async def delete_restore_user(id: PyObjectId, active_user = Depends(get_current_user))->dict:
+@areas.delete("/{id}", name="Eliminar o restaurar área", response_model=AreaRead, status_code=200)
+async def delete_restore_user(id: PyObjectId, response: Response, active_user = Depends(get_current_user))->dict:
     """
     Cambia el área correspondiente al ID ingresado a inactivo (False) o activo (True).
     """
     await validate_role(active_user)
     await db_validation(collection=areas_collection, check_duplicate=False, search_id=True, query_value=id)
-    deleted_area = await delete_restore_document(id, areas_collection, active_user, users_collection, "areas")
-    deleted_area = await populate(deleted_area, "chemicals", chemicals_collection, "chemical")
-    deleted_area = await populate(deleted_area, "last_update_by", users_collection, "username")
+    deleted_area, modified_count = await delete_restore_document(id, areas_collection, active_user, users_collection, "areas")
+    response.headers["X-Cascade-Count"] = str(modified_count)
+    if modified_count:
+        invalidate_area(id)
+    await populate_many([deleted_area], *area_relations)
     return deleted_area
\ No newline at end of file
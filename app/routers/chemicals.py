@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Query, Depends, Body, Path
+from fastapi import APIRouter, Query, Depends, Body, File, Path, Response, UploadFile, Request
 
 from app.core.auth import get_current_user, validate_role
-from app.crud.crud import create_document, delete_restore_document, get_document_by_id, get_documents, update_document
+from app.core.catalog import get_catalog
+from app.core.principal import get_user_role
+from app.core.response_cache import cache_generations
+from app.crud.crud import create_document, delete_restore_document, update_document
 from app.db.database import db
-from app.helpers.helpers import approval_validator, db_validation, multiple_db_validation, multiple_populate, populate, get_approval_info, set_status, set_update_info
+from app.db.relations import approval_relations, chemical_relations
+from app.helpers.cached_reads import cache_read, cached_read, response_cache_key, response_tags
+from app.helpers.etag import document_etag, etag_matches, list_etag, not_modified
+from app.helpers.helpers import approval_validator, db_validation, duplicate_validation, populate_many, get_approval_info, iter_documents, read_document, read_documents, reference_validation, run_validations, set_next_cursor, set_status, set_update_info
+from app.helpers.bulk import import_chemicals, read_upload_rows
+from app.helpers.serialization import read_response
+from app.helpers.streaming import stream_response
 from app.models.area import AreaRead
+from app.models.bulk import BulkReport
 from app.models.chemical import ChemicalCreate, ChemicalRead, ChemicalUpdate
 from app.models.hazard import Hazard
 from app.models.ppe import Ppe
 from app.models.py_object_id import PyObjectId
-from app.models.enums import ApprovalType, QueryStatus
+from app.models.enums import ApprovalType, Pagination, QueryStatus, ReadEngine, ResponseFormat
 
 chemicals = APIRouter(prefix="/chemicals", tags=["Sustancias Químicas"])
 
@@ -19,37 +29,60 @@ ppes_collection = db.ppes
 users_collection = db.users
 areas_collection = db.areas
 
-@chemicals.get('/', name="Obtener sustancias químicas", response_model=list[ChemicalRead], status_code=200, dependencies=[Depends(get_current_user)])
+@chemicals.get('/', name="Obtener sustancias químicas", response_model=list[ChemicalRead], status_code=200)
 async def get_chemicals(
+    request: Request,
+    response: Response,
     skip: int = Query(0, title="Salto de página", description="Índica desde el cual número de documento inicia la consulta a la base de datos"),
     limit: int | None = Query(None, title="Límite", description="Índica la cantidad máxima que obtendrá la consulta a la Base de Datos"),
     status: QueryStatus = Query(QueryStatus.all, title="Estado", description="Determina si se requiere que la consulta obtenga los químicos activos, inactivos o todos"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
+    pagination: Pagination = Query(Pagination.offset, title="Paginación", description="Determina si la consulta se pagina con salto de página (offset) o con cursor (cursor). Con cursor, el siguiente cursor se retorna en el encabezado X-Next-Cursor"),
+    cursor: str | None = Query(None, title="Cursor", description="Cursor retornado en el encabezado X-Next-Cursor de la página anterior"),
+    response_format: ResponseFormat = Query(ResponseFormat.json, title="Formato", description="Determina si la respuesta se envía completa (json) o por partes a medida que se lee la base de datos, como NDJSON (ndjson) o como un arreglo JSON (json_stream)"),
+    active_user = Depends(get_current_user),
     )->list:
     """
     Obtiene todas las sustancias químicas en la base de datos.
     """
-    chemicals = await get_documents(chemicals_collection, skip, limit, status)
-    chemicals = await multiple_populate(chemicals, "hazards", hazards_collection)
-    chemicals = await multiple_populate(chemicals, "ppes", ppes_collection)
-    chemicals = await multiple_populate(chemicals, "last_update_by", users_collection)
-    return chemicals
+    cache_key = response_cache_key(request, await get_user_role(active_user))
+    if response_format == ResponseFormat.json:
+        cached = cached_read(request, cache_key)
+        if cached:
+            return cached
+    tags = response_tags(chemicals_collection, chemical_relations)
+    generations = cache_generations(tags)
+
+    etag = await list_etag(request, chemicals_collection, chemical_relations, status)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    if response_format != ResponseFormat.json:
+        batches = iter_documents(chemicals_collection, chemical_relations, engine, skip, limit, status, pagination=pagination, cursor=cursor)
+        return stream_response(batches, ChemicalRead, response_format, {"ETag": etag})
+
+    chemicals = await read_documents(chemicals_collection, chemical_relations, engine, skip, limit, status, pagination=pagination, cursor=cursor)
+    set_next_cursor(response, chemicals, pagination, limit)
+    return cache_read(cache_key, tags, generations, chemicals, ChemicalRead, response)
 
 @chemicals.get('/{id}',name="Obtener sustancia química", response_model=ChemicalRead, status_code=200, dependencies=[Depends(get_current_user)])
 async def get_chemical(
+    request: Request,
+    response: Response,
     id: PyObjectId = Path(..., title="ID de la sustancia química", description="El MongoID de la sustancia química a buscar"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
     )->dict:
     """
     Obtiene la sustancia química correspondiente al ID ingresado.
     """
+    etag = await document_etag(id, chemicals_collection, (*chemical_relations, *approval_relations))
+    if etag_matches(request, etag):
+        return not_modified(etag)
     await db_validation(collection= chemicals_collection, check_duplicate=False, search_id=True, query_value=id)
-    chemical = await get_document_by_id(id, chemicals_collection)
-    chemical = await populate(chemical, "hazards", hazards_collection)
-    chemical = await populate(chemical, "ppes", ppes_collection)
-    chemical = await populate(chemical, "last_update_by", users_collection)
-    chemical['fsms'] = await populate( chemical['fsms'], 'approbed_by', users_collection)
-    chemical['ems'] = await populate( chemical['ems'], 'approbed_by', users_collection)
-    chemical['ohsms'] = await populate( chemical['ohsms'], 'approbed_by', users_collection)
-    return chemical
+    chemical = await read_document(id, chemicals_collection, (*chemical_relations, *approval_relations), engine)
+    response.headers["ETag"] = etag
+    return read_response(chemical, ChemicalRead, response)
 
 @chemicals.post('/',name="Crear sustancia química", response_model=ChemicalRead, status_code=201)
 async def create_chemical(
@@ -59,18 +92,38 @@ async def create_chemical(
     """
     Crea una sustancia química. Retorna la sustancia química creada.
     """
-    await db_validation(data_in=chemical, field_to_validate="chemical", collection= chemicals_collection)
-    await multiple_db_validation(data_in=chemical, field_to_validate="hazards", collection= hazards_collection)
-    await multiple_db_validation(data_in=chemical, field_to_validate="ppes", collection= ppes_collection)
+    await run_validations(
+        duplicate_validation(chemicals_collection, chemical, "chemical"),
+        reference_validation(hazards_collection, chemical, "hazards"),
+        reference_validation(ppes_collection, chemical, "ppes"),
+    )
     chemical = set_status(chemical)
     chemical = set_update_info(chemical, active_user)
     chemical.update(await get_approval_info())
     new_chemical = await create_document(chemical, chemicals_collection)
-    new_chemical = await populate(new_chemical, "hazards", hazards_collection)
-    new_chemical = await populate(new_chemical, "ppes", ppes_collection)
-    new_chemical = await populate(new_chemical, "last_update_by", users_collection)
+    await populate_many([new_chemical], *chemical_relations)
     return new_chemical
 
+@chemicals.post('/bulk/', name="Crear sustancias químicas en lote", response_model=BulkReport, status_code=200)
+async def create_chemicals(
+    rows: list[dict] = Body(..., title="Sustancias químicas", description="Arreglo con los datos de las sustancias químicas a crear, con el mismo formato de la creación individual"),
+    active_user = Depends(get_current_user)
+    )->dict:
+    """
+    Crea varias sustancias químicas. Retorna el resultado de cada fila, sin detener la importación por las filas no válidas.
+    """
+    return await import_chemicals(rows, active_user)
+
+@chemicals.post('/bulk/upload/', name="Importar sustancias químicas desde archivo", response_model=BulkReport, status_code=200)
+async def upload_chemicals(
+    file: UploadFile = File(..., title="Archivo", description="Archivo CSV (.csv) o NDJSON. En CSV, las listas se separan con | y las frases tienen la forma código: descripción"),
+    active_user = Depends(get_current_user)
+    )->dict:
+    """
+    Crea las sustancias químicas de un archivo CSV o NDJSON. Retorna el resultado de cada fila.
+    """
+    return await import_chemicals(read_upload_rows(file), active_user)
+
 @chemicals.put('/{id}',name="Actualizar sustancia química", response_model=ChemicalRead, status_code=202)
 async def update_chemical(
     id: PyObjectId =  Path(..., title="ID de la sustancia química", description="El MongoID de la sustancia química a actualizar"),
@@ -80,28 +133,27 @@ async def update_chemical(
     """
     Actualiza los datos de la sustancia química del ID ingresado. Retorna la sustancia química actualizada.
     """
-    await db_validation(collection= chemicals_collection, check_duplicate=False, search_id=True, query_value=id)
-    await db_validation(data_in=new_data, field_to_validate="chemical", collection=chemicals_collection)
-    await multiple_db_validation(data_in=new_data, field_to_validate="hazards", collection=hazards_collection)
-    await multiple_db_validation(data_in=new_data, field_to_validate="ppes", collection=ppes_collection)
+    await run_validations(
+        reference_validation(chemicals_collection, query_value=id),
+        duplicate_validation(chemicals_collection, new_data, "chemical"),
+        reference_validation(hazards_collection, new_data, "hazards"),
+        reference_validation(ppes_collection, new_data, "ppes"),
+    )
     new_data = set_update_info(new_data, active_user)
     updated_chemical = await update_document(id, chemicals_collection, new_data)    
-    updated_chemical = await populate(updated_chemical, "hazards", hazards_collection)
-    updated_chemical = await populate(updated_chemical, "ppes", ppes_collection)
-    updated_chemical = await populate(updated_chemical, "last_update_by", users_collection)
+    await populate_many([updated_chemical], *chemical_relations)
     return updated_chemical
 
 @chemicals.delete("/{id}", name="Eliminar o restaurar sustancia química", response_model=ChemicalRead, status_code=200)
-async def delete_restore_user(id: PyObjectId, active_user = Depends(get_current_user))->dict:
+async def delete_restore_user(id: PyObjectId, response: Response, active_user = Depends(get_current_user))->dict:
     """
     Cambia el estado de la sustancia química correspondiente al ID ingresado a inactivo (False) o activo (True).
     """
     await validate_role(active_user)
     await db_validation(collection= chemicals_collection, check_duplicate=False, search_id=True, query_value=id)
-    deleted_chemical = await delete_restore_document(id, chemicals_collection, active_user,  areas_collection, "chemicals")
-    deleted_chemical = await populate(deleted_chemical, "hazards", hazards_collection)
-    deleted_chemical = await populate(deleted_chemical, "ppes", ppes_collection)
-    deleted_chemical = await populate(deleted_chemical, "last_update_by", users_collection)
+    deleted_chemical, modified_count = await delete_restore_document(id, chemicals_collection, active_user,  areas_collection, "chemicals")
+    response.headers["X-Cascade-Count"] = str(modified_count)
+    await populate_many([deleted_chemical], *chemical_relations)
     return deleted_chemical
 
 @chemicals.patch('/approval/{id}', name="Aprobar sustancia química", response_model=ChemicalRead, status_code=202)
@@ -113,10 +165,8 @@ async def chemical_approval(
     await validate_role(active_user, ["ems_approver", "fsms_approver", "ohsms_approver"])
     await db_validation(collection= chemicals_collection, check_duplicate=False, search_id=True, query_value=id)
     await approval_validator(id, approval_type)
-    approved_chemical = await update_document(id, chemicals_collection, await get_approval_info(active_user, approval_type))    
-    approved_chemical = await populate(approved_chemical, "hazards", hazards_collection)
-    approved_chemical = await populate(approved_chemical, "ppes", ppes_collection)
-    approved_chemical = await populate(approved_chemical, "last_update_by", users_collection)
+    approved_chemical = await update_document(id, chemicals_collection, set_update_info(await get_approval_info(active_user, approval_type), active_user))    
+    await populate_many([approved_chemical], *chemical_relations)
     return approved_chemical
 
 @chemicals.get('/hazards/', name="Obtener peligros", response_model=list[Hazard], status_code=200, dependencies=[Depends(get_current_user)])
@@ -125,8 +175,8 @@ async def get_chemicals(
     """
     Obtiene todos los peligros en la base de datos.
     """
-    hazards = await get_documents(hazards_collection)
-    return hazards
+    hazards = (await get_catalog("hazards")).documents
+    return read_response(hazards, Hazard)
 
 @chemicals.get('/hazards/{id}',name="Obtener peligro", response_model=Hazard, status_code=200, dependencies=[Depends(get_current_user)])
 async def get_chemical(
@@ -136,8 +186,8 @@ async def get_chemical(
     Obtiene el peligro correspondiente al ID ingresado.
     """
     await db_validation(collection=hazards_collection, check_duplicate=False, search_id=True, query_value=id)
-    hazard = await get_document_by_id(id, hazards_collection)
-    return hazard
+    hazard = (await get_catalog("hazards")).get(id)
+    return read_response(hazard, Hazard)
 
 @chemicals.get('/ppes/', name="Obtener EPPs", response_model=list[Ppe], status_code=200, dependencies=[Depends(get_current_user)])
 async def get_chemicals(
@@ -145,8 +195,8 @@ async def get_chemicals(
     """
     Obtiene todos los EPP en la base de datos.
     """
-    ppes = await get_documents(ppes_collection)
-    return ppes
+    ppes = (await get_catalog("ppes")).documents
+    return read_response(ppes, Ppe)
 
 @chemicals.get('/ppes/{id}',name="Obtener EPP", response_model=Ppe, status_code=200, dependencies=[Depends(get_current_user)])
 async def get_chemical(
@@ -156,8 +206,8 @@ async def get_chemical(
     Obtiene el peligro correspondiente al ID ingresado.
     """
     await db_validation(collection=ppes_collection, check_duplicate=False, search_id=True, query_value=id)
-    ppe = await get_document_by_id(id, ppes_collection)
-    return ppe
+    ppe = (await get_catalog("ppes")).get(id)
+    return read_response(ppe, Ppe)
 
 @chemicals.get("/areas/{id}",name="Obtener áreas de la sustancia química", status_code=200, response_model=list[AreaRead], response_model_include={"id", "area"})
 async def get_area_chemicals(id: PyObjectId, active_user = Depends(get_current_user))->list[dict]:
@@ -0,0 +1,51 @@
+import secrets
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.core.auth import get_current_user, oauth2_scheme, validate_role
+from app.core.config import get_settings
+from app.core.metrics import format_metric, render_collected
+from app.core.principal import principal_cache
+from app.core.response_cache import response_cache
+from app.core.security import hashing_queue
+
+metrics = APIRouter()
+
+def cache_lines()->list[str]:
+    """
+    Aciertos, fallos, tamaño y proporción de aciertos de la caché de respuestas y de la caché de usuarios autenticados.
+    """
+    caches = {"responses": response_cache, "principals": principal_cache}
+    labels = ("cache",)
+    return [
+        *format_metric("chems_cache_hits_total", "counter", "Lecturas servidas desde la caché.", [(labels, (name,), cache.hits) for name, cache in caches.items()]),
+        *format_metric("chems_cache_misses_total", "counter", "Lecturas que no estaban en la caché.", [(labels, (name,), cache.misses) for name, cache in caches.items()]),
+        *format_metric("chems_cache_size", "gauge", "Elementos guardados en la caché.", [(labels, (name,), len(cache)) for name, cache in caches.items()]),
+        *format_metric("chems_cache_hit_ratio", "gauge", "Proporción de aciertos desde el inicio del proceso.",
+            [(labels, (name,), round(cache.hits / (cache.hits + cache.misses), 4) if cache.hits + cache.misses else 0) for name, cache in caches.items()]),
+    ]
+
+async def metrics_auth(token: str = Depends(oauth2_scheme))->None:
+    """
+    Permite leer las métricas con el token METRICS_TOKEN, pensado para el scraper de Prometheus, o con el token de sesión de un administrador.
+    """
+    metrics_token = get_settings().METRICS_TOKEN
+    if metrics_token and secrets.compare_digest(token.encode(), metrics_token.encode()):
+        return
+    await validate_role(await get_current_user(token))
+
+@metrics.get("/metrics", include_in_schema=False, dependencies=[Depends(metrics_auth)])
+async def get_metrics()->PlainTextResponse:
+    """
+    Métricas del proceso en el formato de texto de Prometheus. Cada worker tiene sus propias métricas.
+    """
+    settings = get_settings()
+    lines = [
+        *render_collected(),
+        *format_metric("chems_mongo_pool_max_size", "gauge", "Tamaño máximo del pool de conexiones por servidor.", [((), (), settings.MONGO_MAX_POOL_SIZE)]),
+        *format_metric("chems_hashing_queue_depth", "gauge", "Operaciones de bcrypt en ejecución o en espera.", [((), (), hashing_queue["depth"])]),
+        *format_metric("chems_hashing_queue_limit", "gauge", "Operaciones de bcrypt admitidas antes de responder 503.", [((), (), settings.HASHING_MAX_QUEUE)]),
+        *cache_lines(),
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
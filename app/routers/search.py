@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, Request, Response
 from app.core.auth import get_current_user
-from app.crud.crud import get_documents
+from app.core.principal import get_user_role
+from app.core.response_cache import cache_generations
 
 from app.db.database import db
-from app.helpers.helpers import multiple_populate
-from app.models.enums import Collections, QueryStatus, SearchKeys
+from app.db.relations import area_relations, chemical_relations, user_relations
+from app.helpers.cached_reads import cache_read, cached_read, response_cache_key, response_tags
+from app.helpers.helpers import iter_documents, read_documents, set_next_cursor
+from app.helpers.streaming import stream_response
+from app.models.enums import Collections, Pagination, QueryStatus, ReadEngine, ResponseFormat, SearchKeys
 from app.models.area import AreaRead
 from app.models.chemical import ChemicalRead
 from app.models.hazard import Hazard
@@ -23,66 +27,87 @@ roles_collection = db.roles
 
 @search.get(
     "/", name="Buscar", status_code=200, 
-    response_model=list[UserRead] | list[AreaRead] | list[ChemicalRead] | list[Hazard] | list[Ppe] | list[Role], 
-    dependencies=[Depends(get_current_user)])
+    response_model=list[UserRead] | list[AreaRead] | list[ChemicalRead] | list[Hazard] | list[Ppe] | list[Role])
 async def search_item(
+    request: Request,
+    response: Response,
     collection_name: Collections,
     search_query: str,
     skip: int = Query(0, title="Salto de página", description="Índica desde el cual número de documento inicia la consulta a la base de datos"),
     limit: int | None = Query(None, title="Límite", description="Índica la cantidad máxima que obtendrá la consulta a la Base de Datos"),
     status: QueryStatus = Query(QueryStatus.all, title="Estado", description="Determina si se requiere que la consulta obtenga ítems activos, inactivos o todos. No funciona con Peligros (Hazards), Roles (Roles), EPPs (PPEs)"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
+    pagination: Pagination = Query(Pagination.offset, title="Paginación", description="Determina si la consulta se pagina con salto de página (offset) o con cursor (cursor). Con cursor, el siguiente cursor se retorna en el encabezado X-Next-Cursor"),
+    cursor: str | None = Query(None, title="Cursor", description="Cursor retornado en el encabezado X-Next-Cursor de la página anterior"),
+    relevance: bool = Query(False, title="Relevancia", description="Ordena los resultados de más a menos relevante. Solo aplica con paginación por salto de página"),
+    response_format: ResponseFormat = Query(ResponseFormat.json, title="Formato", description="Determina si la respuesta se envía completa (json) o por partes a medida que se lee la base de datos, como NDJSON (ndjson) o como un arreglo JSON (json_stream)"),
+    active_user = Depends(get_current_user),
 )->list:
     """
     Busca ítems de acuerdo a los parámetros suministrados
     """
     collection = None
     search_keys = None
+    relations = ()
+    model = None
 
     if collection_name == Collections.areas:
         collection = areas_collection
         search_keys = SearchKeys.areas
+        relations = area_relations
+        model = AreaRead
     if collection_name == Collections.chemicals:
         collection = chemicals_collection
         search_keys = SearchKeys.chemicals
+        relations = chemical_relations
+        model = ChemicalRead
     if collection_name == Collections.hazards:
         collection = hazards_collection
         search_keys = SearchKeys.hazards
+        model = Hazard
         status = QueryStatus.all
     if collection_name == Collections.ppes:
         collection = ppes_collection
         search_keys = SearchKeys.ppes
+        model = Ppe
         status = QueryStatus.all
     if collection_name == Collections.roles:
         collection = roles_collection
         search_keys = SearchKeys.roles
+        model = Role
         status = QueryStatus.all
     if collection_name == Collections.users:
         collection = users_collection
         search_keys = SearchKeys.users
+        relations = user_relations
+        model = UserRead
 
-
-    results = await get_documents(
+    read_params = dict(
         collection=collection,
+        relations=relations,
+        engine=engine,
         skip=skip, 
         limit=limit,
         status=status,
         query_keys=search_keys,
-        query_value=search_query)
+        query_value=search_query,
+        pagination=pagination,
+        cursor=cursor,
+        relevance=relevance)
 
-    if collection_name == Collections.users:
-        results = await multiple_populate(results, "areas", areas_collection, "area")
-        results = await multiple_populate(results, "role", roles_collection)
-        results = await multiple_populate(results, "last_update_by", users_collection, "username")
+    if response_format != ResponseFormat.json:
+        return stream_response(iter_documents(**read_params), model, response_format)
 
-    if collection_name == Collections.areas:
-        results = await multiple_populate(results, "chemicals", chemicals_collection, "chemical")
-        results = await multiple_populate(results, "last_update_by", users_collection, "username")
+    cache_key = response_cache_key(request, await get_user_role(active_user))
+    cached = cached_read(request, cache_key)
+    if cached:
+        return cached
+    tags = response_tags(collection, relations)
+    generations = cache_generations(tags)
 
-    if collection_name == Collections.chemicals:
-        results = await multiple_populate(results, "hazards", hazards_collection)
-        results = await multiple_populate(results, "ppes", ppes_collection)
-        results = await multiple_populate(results, "last_update_by", users_collection, "username")
+    results = await read_documents(**read_params)
+    set_next_cursor(response, results, pagination, limit)
 
-    return results
+    return cache_read(cache_key, tags, generations, results, model, response)
 
 
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Body, Query, Path, Depends
+from fastapi import APIRouter, Body, HTTPException, Query, Path, Depends, Response, Request
+from fastapi.responses import PlainTextResponse
 
 from app.core.auth import get_current_user, login_for_access_token, validate_role
-from app.crud.crud import delete_restore_document, get_document_by_id, get_documents, create_document, update_document
+from app.core.catalog import get_catalog, load_catalogs
+from app.core.principal import invalidate_role, invalidate_user, principal_cache
+from app.core.profiler import profile_files
+from app.core.response_cache import cache_stats
+from app.core.security import hash_password
+from app.crud.crud import delete_restore_document, create_document, update_document
+from app.db.change_stream import watcher_state
 from app.db.database import db
-from app.helpers.helpers import drop_inactive_nested_ids, populate, multiple_populate, db_validation, multiple_db_validation, set_status, set_update_info
+from app.db.slow_operations import slow_operations
+from app.db.relations import user_relations
+from app.helpers.etag import document_etag, etag_matches, list_etag, not_modified
+from app.helpers.helpers import drop_inactive_nested_ids, populate, populate_many, iter_documents, read_document, read_documents, reference_validation, run_validations, set_next_cursor, db_validation, duplicate_validation, set_status, set_update_info
+from app.helpers.serialization import read_response
+from app.helpers.streaming import stream_response
 from app.models.py_object_id import PyObjectId
 from app.models.role import Role
 from app.models.token import Token
 from app.models.user import ActiveUser, UserRead, UserCreate, UserUpdate
-from app.models.enums import QueryStatus
+from app.models.enums import Pagination, QueryStatus, ReadEngine, ResponseFormat
 
 users = APIRouter(prefix='/users', tags=['Usuarios'])
 
@@ -18,36 +30,53 @@ roles_collection = db.roles
 
 @users.get('/', name="Obtener usuarios", response_model=list[UserRead], status_code=200)
 async def get_users(
+    request: Request,
+    response: Response,
     skip: int = Query(0, title="Salto de página", description="Índica desde el cual número de documento inicia la consulta a la base de datos"),
     limit: int | None = Query(None, title="Límite", description="Índica la cantidad máxima que obtendrá la consulta a la Base de Datos"),
     status: QueryStatus = Query(QueryStatus.all, title="Estado", description="Determina si se requiere que la consulta obtenga los usuarios activos, inactivos o todos"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
+    pagination: Pagination = Query(Pagination.offset, title="Paginación", description="Determina si la consulta se pagina con salto de página (offset) o con cursor (cursor). Con cursor, el siguiente cursor se retorna en el encabezado X-Next-Cursor"),
+    cursor: str | None = Query(None, title="Cursor", description="Cursor retornado en el encabezado X-Next-Cursor de la página anterior"),
+    response_format: ResponseFormat = Query(ResponseFormat.json, title="Formato", description="Determina si la respuesta se envía completa (json) o por partes a medida que se lee la base de datos, como NDJSON (ndjson) o como un arreglo JSON (json_stream)"),
     active_user = Depends(get_current_user)
     )->list:
     """
     Obtiene todos los usuarios en la base de datos.
     """
     await validate_role(active_user)
-    users = await get_documents(users_collection, skip, limit, status)
-    users = await multiple_populate(users, "areas", areas_collection, "area")
-    users = await multiple_populate(users, "role", roles_collection)
-    users = await multiple_populate(users, "last_update_by", users_collection, "username")
-    return users
+    etag = await list_etag(request, users_collection, user_relations, status)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    if response_format != ResponseFormat.json:
+        batches = iter_documents(users_collection, user_relations, engine, skip, limit, status, pagination=pagination, cursor=cursor)
+        return stream_response(batches, UserRead, response_format, {"ETag": etag})
+
+    users = await read_documents(users_collection, user_relations, engine, skip, limit, status, pagination=pagination, cursor=cursor)
+    set_next_cursor(response, users, pagination, limit)
+    return read_response(users, UserRead, response)
 
 @users.get('/{id}',name="Obtener usuario", response_model=UserRead, status_code=200)
 async def get_user(
+    request: Request,
+    response: Response,
     id: PyObjectId = Path(..., title="ID del Usuario", description="El MongoID del usuario a buscar"),
+    engine: ReadEngine = Query(ReadEngine.populate, title="Motor de lectura", description="Determina si la consulta se resuelve con consultas por relación (populate) o con una sola agregación (aggregation)"),
     active_user = Depends(get_current_user)
     )->dict:
     """
     Obtiene el usuario correspondiente al ID ingresado.
     """
     await validate_role(active_user)
+    etag = await document_etag(id, users_collection, user_relations)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     await db_validation(collection=users_collection, check_duplicate=False, search_id=True, query_value=id)
-    user = await get_document_by_id(id, users_collection)
-    user = await populate(user, "areas", areas_collection, "area")
-    user = await populate(user, "role", roles_collection)
-    user = await populate(user, "last_update_by", users_collection, "username")
-    return user
+    user = await read_document(id, users_collection, user_relations, engine)
+    response.headers["ETag"] = etag
+    return read_response(user, UserRead, response)
 
 @users.post('/',name="Crear usuario", response_model=UserRead, status_code=201)
 async def create_user(
@@ -58,17 +87,18 @@ async def create_user(
     Crea un usuario. Retorna el usuario Creado.
     """
     await validate_role(active_user)
-    await db_validation(data_in=user, field_to_validate="username", collection=users_collection)
-    await db_validation(data_in=user, field_to_validate="email", collection=users_collection)
-    await db_validation(data_in=user, field_to_validate="role", collection=roles_collection, check_duplicate=False, search_id=True)
-    await multiple_db_validation(data_in=user, field_to_validate="areas", collection=areas_collection)
+    await run_validations(
+        duplicate_validation(users_collection, user, "username"),
+        duplicate_validation(users_collection, user, "email"),
+        reference_validation(roles_collection, user, "role"),
+        reference_validation(areas_collection, user, "areas"),
+    )
     user = set_status(user)
     user = set_update_info(user, active_user)
+    user["password"] = await hash_password(user["password"])
     user = await drop_inactive_nested_ids(user, "areas", areas_collection)
     new_user = await create_document(user, users_collection)
-    new_user = await populate(new_user, "areas", areas_collection, "area")
-    new_user = await populate(new_user, "role", roles_collection)
-    new_user = await populate(new_user, "last_update_by", users_collection, "username")
+    await populate_many([new_user], *user_relations)
     return new_user
 
 @users.put('/{id}',name="Actualizar usuario", response_model=UserRead, status_code=202)
@@ -81,17 +111,20 @@ async def update_user(
     Actualiza los datos del Usuario con el ID ingresado. Retorna el usuario actualizado.
     """
     await validate_role(active_user)
-    await db_validation(collection=users_collection, check_duplicate=False, search_id=True, query_value=id)
-    await db_validation(data_in=new_data, field_to_validate="username", collection=users_collection)
-    await db_validation(data_in=new_data, field_to_validate="email", collection=users_collection)
-    await db_validation(data_in=new_data, field_to_validate="role", collection=roles_collection, check_duplicate=False, search_id=True)
-    await multiple_db_validation(data_in=new_data, field_to_validate="areas", collection=areas_collection)
+    await run_validations(
+        reference_validation(users_collection, query_value=id),
+        duplicate_validation(users_collection, new_data, "username"),
+        duplicate_validation(users_collection, new_data, "email"),
+        reference_validation(roles_collection, new_data, "role"),
+        reference_validation(areas_collection, new_data, "areas"),
+    )
     new_data = set_update_info(new_data, active_user)
+    if new_data.get("password"):
+        new_data["password"] = await hash_password(new_data["password"])
     new_data = await drop_inactive_nested_ids(new_data, "areas", areas_collection)
     updated_user = await update_document(id, users_collection, new_data)    
-    updated_user = await populate(updated_user, "areas", areas_collection, "area")
-    updated_user = await populate(updated_user, "role", roles_collection)
-    updated_user = await populate(updated_user, "last_update_by", users_collection, "username")
+    invalidate_user(id)
+    await populate_many([updated_user], *user_relations)
     return updated_user
 
 
@@ -102,10 +135,9 @@ async def delete_restore_user(id: PyObjectId, active_user = Depends(get_current_
     """
     await validate_role(active_user)
     await db_validation(collection=users_collection, check_duplicate=False , search_id=True, query_value=id)
-    deleted_user = await delete_restore_document(id, users_collection, active_user)
-    deleted_user = await populate(deleted_user, "areas", areas_collection, "area")
-    deleted_user = await populate(deleted_user, "role", roles_collection)
-    deleted_user = await populate(deleted_user, "last_update_by", users_collection, "username")
+    deleted_user, _ = await delete_restore_document(id, users_collection, active_user)
+    invalidate_user(id)
+    await populate_many([deleted_user], *user_relations)
     return deleted_user
 
 @users.post("/login", response_model=Token)
@@ -126,8 +158,8 @@ async def get_roles(active_user = Depends(get_current_user))->list:
     Obtiene todos los roles en la base de datos.
     """
     await validate_role(active_user)
-    roles = await get_documents(roles_collection)
-    return roles
+    roles = (await get_catalog("roles")).documents
+    return read_response(roles, Role)
 
 @users.get('/roles/{id}', name="Obtener rol", response_model=Role, status_code=200)
 async def get_user(
@@ -139,6 +171,64 @@ async def get_user(
     """
     await validate_role(active_user)
     await db_validation(collection=roles_collection, check_duplicate=False, search_id=True, query_value=id)
-    role = await get_document_by_id(id, roles_collection)
-    return role
+    role = (await get_catalog("roles")).get(id)
+    return read_response(role, Role)
+
+@users.post('/catalogs/reload/', name="Recargar catálogos", status_code=200)
+async def reload_catalogs(active_user = Depends(get_current_user))->dict:
+    """
+    Vuelve a cargar desde la base de datos los catálogos en memoria de peligros, EPP y roles. Retorna la cantidad de documentos por catálogo.
+    """
+    await validate_role(active_user)
+    catalogs = await load_catalogs()
+    invalidate_role()
+    return catalogs
+
+@users.get('/caches/', name="Obtener estadísticas de cachés", status_code=200)
+async def get_cache_stats(active_user = Depends(get_current_user))->dict:
+    """
+    Obtiene el tamaño y los aciertos y fallos de la caché de respuestas y de la caché de usuarios autenticados, y el estado del seguimiento de cambios.
+    """
+    await validate_role(active_user)
+    return {
+        "responses": cache_stats(),
+        "principals": {"size": len(principal_cache), "hits": principal_cache.hits, "misses": principal_cache.misses},
+        "change_stream": {"status": watcher_state["status"], "events": watcher_state["events"], "error": watcher_state["error"]},
+    }
+
+@users.get('/slow_operations/', name="Obtener operaciones lentas", status_code=200)
+async def get_slow_operations(
+    collscan: bool = Query(False, title="Solo COLLSCAN", description="Retorna solo las operaciones cuyo plan recorre la colección completa"),
+    active_user = Depends(get_current_user)
+    )->list:
+    """
+    Obtiene las últimas operaciones de Mongo de este proceso que superaron SLOW_OPERATION_MS, de la más reciente a la más antigua, con su plan si se explicaron.
+    """
+    await validate_role(active_user)
+    operations = reversed(slow_operations)
+    if collscan:
+        return [operation for operation in operations if operation["plan"] and operation["plan"].get("collscan")]
+    return list(operations)
+
+@users.get('/profiles/', name="Obtener perfiles guardados", status_code=200)
+async def get_profiles(active_user = Depends(get_current_user))->list:
+    """
+    Obtiene los perfiles de solicitudes guardados en PROFILE_DIR, del más reciente al más antiguo.
+    """
+    await validate_role(active_user)
+    return [{"name": file.name, "size": file.stat().st_size} for file in reversed(profile_files())]
+
+@users.get('/profiles/{name}', name="Obtener perfil", status_code=200, response_class=PlainTextResponse)
+async def get_profile(
+    name: str = Path(..., title="Nombre del perfil", description="Nombre retornado en el encabezado X-Profile-Id"),
+    active_user = Depends(get_current_user)
+    )->PlainTextResponse:
+    """
+    Obtiene un perfil guardado en formato folded, que se puede abrir con flamegraph.pl o speedscope.
+    """
+    await validate_role(active_user)
+    for file in profile_files():
+        if file.name == name:
+            return PlainTextResponse(file.read_text(encoding="utf-8"))
+    raise HTTPException(status_code=404, detail="No se encontró el perfil")
 
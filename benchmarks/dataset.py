@@ -0,0 +1,205 @@
+"""
+Genera un conjunto de datos sintético y reproducible: sustancias químicas con peligros, EPP y frases GHS, áreas con sus sustancias y usuarios con sus áreas y roles.
+Los documentos tienen la misma forma que los que guarda la API, con los textos normalizados y los campos de búsqueda.
+
+Uso: python -m benchmarks.dataset [--chemicals N] [--areas N] [--users N] [--seed N] [--password TEXTO]
+Reemplaza las colecciones de la base de datos de MONGO_DATABASE, que no puede ser ChemApp_DB. El mismo seed genera siempre los mismos documentos y MongoID.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import json
+import random
+import sys
+
+from bson import ObjectId
+from pymongo import InsertOne
+
+from app.core.config import get_settings
+from app.core.security import pwd_context
+from app.crud.crud import set_search_fields
+from app.db.database import db
+from app.db.indexes import ensure_indexes
+from app.helpers.helpers import text_normalizer_lower, text_normalizer_title
+from app.models.enums import Collections
+
+h_phrases = [
+    ("H225", "Líquido y vapores muy inflamables."),
+    ("H226", "Líquidos y vapores inflamables."),
+    ("H290", "Puede ser corrosivo para los metales."),
+    ("H301", "Tóxico en caso de ingestión."),
+    ("H302", "Nocivo en caso de ingestión."),
+    ("H314", "Provoca graves quemaduras en la piel y lesiones oculares graves."),
+    ("H315", "Provoca irritación cutánea."),
+    ("H317", "Puede provocar una reacción alérgica en la piel."),
+    ("H318", "Provoca lesiones oculares graves."),
+    ("H319", "Provoca irritación ocular grave."),
+    ("H331", "Tóxico en caso de inhalación."),
+    ("H335", "Puede irritar las vías respiratorias."),
+    ("H336", "Puede provocar somnolencia o vértigo."),
+    ("H350", "Puede provocar cáncer."),
+    ("H373", "Puede provocar daños en los órganos tras exposiciones prolongadas o repetidas."),
+    ("H400", "Muy tóxico para los organismos acuáticos."),
+    ("H411", "Tóxico para los organismos acuáticos, con efectos nocivos duraderos."),
+]
+
+p_phrases = [
+    ("P101", "Si se necesita consultar a un médico, tener a mano el recipiente o la etiqueta."),
+    ("P102", "Mantener fuera del alcance de los niños."),
+    ("P210", "Mantener alejado del calor, superficies calientes, chispas, llamas al descubierto y otras fuentes de ignición. No fumar."),
+    ("P233", "Mantener el recipiente herméticamente cerrado."),
+    ("P260", "No respirar polvos, humos, gases, nieblas, vapores o aerosoles."),
+    ("P264", "Lavarse las manos concienzudamente tras la manipulación."),
+    ("P270", "No comer, beber ni fumar durante su utilización."),
+    ("P273", "Evitar su liberación al medio ambiente."),
+    ("P280", "Llevar guantes, prendas, gafas y máscara de protección."),
+    ("P301", "En caso de ingestión:"),
+    ("P303", "En caso de contacto con la piel o el pelo:"),
+    ("P304", "En caso de inhalación:"),
+    ("P305", "En caso de contacto con los ojos:"),
+    ("P310", "Llamar inmediatamente a un centro de toxicología o a un médico."),
+    ("P403", "Almacenar en un lugar bien ventilado."),
+    ("P405", "Guardar bajo llave."),
+    ("P501", "Eliminar el contenido y el recipiente conforme a la normativa local."),
+]
+
+chemical_names = [
+    "ácido sulfúrico", "ácido clorhídrico", "ácido nítrico", "ácido acético", "acetona", "alcohol isopropílico", "etanol", "metanol",
+    "hidróxido de sodio", "hidróxido de potasio", "hipoclorito de sodio", "peróxido de hidrógeno", "tolueno", "xileno", "hexano",
+    "amoníaco", "formaldehído", "glutaraldehído", "cloruro de metileno", "acetato de etilo", "thinner", "desengrasante industrial",
+    "aceite hidráulico", "grasa de litio", "refrigerante", "soda cáustica", "cal viva", "sulfato de cobre", "nitrato de amonio", "gasolina",
+]
+area_names = ["bodega", "laboratorio", "planta", "mantenimiento", "calderas", "taller", "producción", "tratamiento de aguas", "empaque", "despacho"]
+providers = ["químicos del norte", "distribuidora andina", "insumos industriales", "laboratorios unidos", "proquímica", "solventes y cía"]
+manufacturers = ["basf", "dow", "merck", "3m", "sika", "bayer", "henkel"]
+firstnames = ["ana", "juan", "maría", "carlos", "lucía", "pedro", "sofía", "andrés", "valentina", "diego", "camila", "jorge"]
+lastnames = ["pérez", "gómez", "rodríguez", "lópez", "martínez", "garcía", "hernández", "díaz", "torres", "ramírez", "vargas", "rojas"]
+
+def catalog_documents(file_name: str)->list[dict]:
+    return json.load(open(f"app/static/{file_name}.json", encoding="utf-8"))
+
+def object_ids(start: datetime):
+    """
+    MongoID crecientes y reproducibles: el mismo conjunto de datos genera siempre los mismos MongoID, en el mismo orden.
+    """
+    timestamp = int(start.replace(tzinfo=timezone.utc).timestamp())
+    counter = 0
+    while True:
+        counter += 1
+        yield ObjectId(f"{timestamp:08x}{counter:016x}")
+
+def approval(rng: random.Random, approvers: list[dict], date: datetime)->dict:
+    if not approvers or rng.random() > 0.4:
+        return {"approval": False, "approbed_by": None, "approval_date": None}
+    return {"approval": True, "approbed_by": rng.choice(approvers)["_id"], "approval_date": date}
+
+def generate_dataset(chemicals: int = 2000, areas: int = 50, users: int = 200, seed: int = 0, password: str = "benchmark")->dict[str, list[dict]]:
+    """
+    Retorna los documentos de cada colección. Todos los usuarios tienen la contraseña ingresada y el usuario admin tiene el rol de administrador.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    ids = object_ids(start)
+    dataset = {
+        "hazards": [dict(document, _id=next(ids)) for document in catalog_documents("hazards")],
+        "ppes": [dict(document, _id=next(ids)) for document in catalog_documents("ppe")],
+        "roles": [dict(document, _id=next(ids)) for document in catalog_documents("roles")],
+    }
+    roles = {role["role"]: role["_id"] for role in dataset["roles"]}
+    hashed_password = pwd_context.hash(password)
+
+    user_documents = [{"_id": next(ids), "firstname": "Admin", "lastname": "Benchmark", "email": "admin@benchmark.com", "username": "admin", "role": roles["admin"]}]
+    for index in range(users - 1):
+        firstname, lastname = rng.choice(firstnames), rng.choice(lastnames)
+        role = rng.choices(list(roles), weights=[1, 16, 1, 1, 1])[0]
+        username = text_normalizer_lower(f"{firstname}.{lastname}{index}")
+        user_documents.append({
+            "_id": next(ids),
+            "firstname": text_normalizer_title(firstname),
+            "lastname": text_normalizer_title(lastname),
+            "email": f"{username}@benchmark.com",
+            "username": username,
+            "role": roles[role],
+        })
+    approvers = [user for user in user_documents if user["role"] != roles["user"]]
+
+    chemical_documents = []
+    for index in range(chemicals):
+        date = start + timedelta(minutes=index)
+        chemical_documents.append({
+            "_id": next(ids),
+            "chemical": text_normalizer_title(f"{chemical_names[index % len(chemical_names)]} {index // len(chemical_names) + 1}"),
+            "hazards": [hazard["_id"] for hazard in rng.sample(dataset["hazards"], rng.randint(1, 4))],
+            "ppes": [ppe["_id"] for ppe in rng.sample(dataset["ppes"], rng.randint(1, 4))],
+            "providers": [text_normalizer_title(provider) for provider in rng.sample(providers, rng.randint(1, 3))],
+            "manufacturers": [text_normalizer_title(manufacturer) for manufacturer in rng.sample(manufacturers, rng.randint(1, 2))],
+            "p_phrases": [{"code": code, "description": description} for code, description in sorted(rng.sample(p_phrases, rng.randint(2, 6)))],
+            "h_phrases": [{"code": code, "description": description} for code, description in sorted(rng.sample(h_phrases, rng.randint(1, 4)))],
+            "sds": [f"Https://Sds.Benchmark.Com/{index}.Pdf"],
+            "fsms": approval(rng, approvers, date),
+            "ems": approval(rng, approvers, date),
+            "ohsms": approval(rng, approvers, date),
+            "last_update_by": rng.choice(user_documents)["_id"],
+            "last_update_date": date,
+            "status": rng.random() > 0.05,
+        })
+    active_chemicals = [chemical["_id"] for chemical in chemical_documents if chemical["status"]]
+
+    area_documents = []
+    for index in range(areas):
+        area_documents.append({
+            "_id": next(ids),
+            "area": text_normalizer_title(f"{area_names[index % len(area_names)]} {index // len(area_names) + 1}"),
+            "chemicals": rng.sample(active_chemicals, min(len(active_chemicals), rng.randint(10, 60))),
+            "last_update_by": rng.choice(user_documents)["_id"],
+            "last_update_date": start + timedelta(minutes=index),
+            "status": rng.random() > 0.05,
+        })
+    active_areas = [area["_id"] for area in area_documents if area["status"]]
+
+    for index, user in enumerate(user_documents):
+        user.update({
+            "password": hashed_password,
+            "areas": rng.sample(active_areas, min(len(active_areas), rng.randint(1, 3))),
+            "last_update_by": user_documents[0]["_id"],
+            "last_update_date": start + timedelta(minutes=index),
+            "status": index == 0 or rng.random() > 0.05,
+        })
+
+    dataset.update(chemicals=chemical_documents, areas=area_documents, users=user_documents)
+    for collection_name, documents in dataset.items():
+        for document in documents:
+            set_search_fields(document, db[collection_name])
+    return dataset
+
+async def load_dataset(dataset: dict[str, list[dict]], batch_size: int = 1000)->dict:
+    """
+    Reemplaza el contenido de las colecciones de la base de datos configurada por el conjunto de datos y crea los índices declarados.
+    Retorna la cantidad de documentos insertados por colección.
+    """
+    report = {}
+    for collection_name in Collections:
+        collection = db[collection_name.value]
+        await collection.drop()
+        documents = dataset.get(collection_name.value, [])
+        for start in range(0, len(documents), batch_size):
+            await collection.bulk_write([InsertOne(document) for document in documents[start:start + batch_size]], ordered=False)
+        report[collection_name.value] = len(documents)
+    await ensure_indexes()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga un conjunto de datos sintético en la base de datos configurada")
+    parser.add_argument("--chemicals", type=int, default=2000)
+    parser.add_argument("--areas", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default="benchmark", help="Contraseña de todos los usuarios, incluido admin")
+    args = parser.parse_args()
+    if get_settings().MONGO_DATABASE == "ChemApp_DB":
+        sys.exit("La carga reemplaza las colecciones; configure MONGO_DATABASE con una base de datos distinta a ChemApp_DB")
+
+    dataset = generate_dataset(args.chemicals, args.areas, args.users, args.seed, args.password)
+    for collection_name, count in asyncio.run(load_dataset(dataset)).items():
+        print(f"{collection_name}: {count} documentos")
@@ -0,0 +1,198 @@
+"""
+Genera carga contra una instancia de la API con una mezcla configurable de inicios de sesión, lecturas de listas, búsquedas, aprobaciones y escrituras.
+Reporta el throughput y las latencias p50, p95 y p99 por ruta.
+
+Uso: python -m benchmarks.load [--url URL] [--duration SEGUNDOS] [--concurrency N] [--mix login=1,list=10,search=5,approval=1,write=2]
+                               [--username admin] [--password benchmark] [--seed N] [--json ARCHIVO]
+Los datos se preparan con python -m benchmarks.dataset y la API se inicia aparte, por ejemplo con uvicorn y los workers a comparar.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+default_mix = "login=1,list=10,search=5,approval=1,write=2"
+approval_types = ["ems", "fsms", "ohsms"]
+# Prefijos que encuentran sustancias del conjunto de datos de benchmarks.dataset.
+search_queries = ["acido", "acet", "alcohol", "hidro", "sodio", "potasio", "perox", "tolu", "metanol", "amon", "formal", "gasol", "sulfato", "zzz"]
+
+def parse_mix(mix: str)->dict[str, float]:
+    """
+    Convierte una mezcla de la forma login=1,list=10 en los pesos de cada operación.
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in operations:
+            raise ValueError(f"Operación desconocida: {name}. Opciones: {', '.join(operations)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(values: list[float], fraction: float)->float:
+    """
+    Percentil por rango más cercano de una lista ordenada.
+    """
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+class LoadState:
+    """
+    Datos compartidos por los workers: el token, los MongoID disponibles y las latencias registradas por ruta.
+    """
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.headers = {}
+        self.chemicals: list[str] = []
+        self.areas: list[str] = []
+        self.hazards: list[str] = []
+        self.ppes: list[str] = []
+        self.pending_approvals: list[tuple] = []
+        self.counter = itertools.count()
+        self.run_id = f"{seed}{int(time.time())}"
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, route: str, duration: float, ok: bool)->None:
+        self.latencies.setdefault(route, []).append(duration)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+async def login(client: httpx.AsyncClient, state: LoadState, credentials: dict):
+    return "POST /users/login", await client.post("/users/login", data=credentials)
+
+async def list_read(client: httpx.AsyncClient, state: LoadState, credentials: dict):
+    rng = state.rng
+    choice = rng.randrange(5)
+    if choice == 0:
+        return "GET /chemicals/", await client.get("/chemicals/", params={"limit": 50, "skip": rng.randrange(0, max(1, len(state.chemicals) - 50))}, headers=state.headers)
+    if choice == 1:
+        return "GET /chemicals/{id}", await client.get(f"/chemicals/{rng.choice(state.chemicals)}", headers=state.headers)
+    if choice == 2:
+        return "GET /areas/", await client.get("/areas/", params={"limit": 20}, headers=state.headers)
+    if choice == 3:
+        return "GET /areas/{id}", await client.get(f"/areas/{rng.choice(state.areas)}", headers=state.headers)
+    return "GET /users/", await client.get("/users/", params={"limit": 50}, headers=state.headers)
+
+async def search(client: httpx.AsyncClient, state: LoadState, credentials: dict):
+    rng = state.rng
+    if rng.random() < 0.8:
+        return "GET /search/ chemicals", await client.get("/search/", params={"collection_name": "chemicals", "search_query": rng.choice(search_queries), "limit": 50}, headers=state.headers)
+    return "GET /search/ users", await client.get("/search/", params={"collection_name": "users", "search_query": rng.choice("abcdjlmpsv"), "limit": 50}, headers=state.headers)
+
+async def approval(client: httpx.AsyncClient, state: LoadState, credentials: dict):
+    if not state.pending_approvals:
+        return await list_read(client, state, credentials)
+    id, approval_type = state.pending_approvals.pop()
+    return "PATCH /chemicals/approval/{id}", await client.patch(f"/chemicals/approval/{id}", params={"approval_type": approval_type}, headers=state.headers)
+
+async def write(client: httpx.AsyncClient, state: LoadState, credentials: dict):
+    rng = state.rng
+    if rng.random() < 0.5:
+        return "PUT /chemicals/{id}", await client.put(f"/chemicals/{rng.choice(state.chemicals)}", json={"providers": [f"proveedor {rng.randrange(100)}"]}, headers=state.headers)
+    chemical = {
+        "chemical": f"sustancia carga {state.run_id} {next(state.counter)}",
+        "hazards": rng.sample(state.hazards, rng.randint(1, 4)),
+        "ppes": rng.sample(state.ppes, rng.randint(1, 3)),
+        "providers": ["proveedor carga"],
+    }
+    return "POST /chemicals/", await client.post("/chemicals/", json=chemical, headers=state.headers)
+
+operations = {"login": login, "list": list_read, "search": search, "approval": approval, "write": write}
+
+async def prepare(client: httpx.AsyncClient, state: LoadState, credentials: dict)->None:
+    """
+    Inicia sesión y obtiene los MongoID que usan las operaciones, incluidas las aprobaciones pendientes.
+    """
+    response = await client.post("/users/login", data=credentials)
+    response.raise_for_status()
+    state.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    chemicals = (await client.get("/chemicals/", params={"status": "active", "response_format": "ndjson"}, headers=state.headers)).text.splitlines()
+    chemicals = [json.loads(line) for line in chemicals if line]
+    state.chemicals = [chemical["_id"] for chemical in chemicals]
+    state.pending_approvals = [(chemical["_id"], approval_type) for chemical in chemicals for approval_type in approval_types if not chemical[approval_type]["approval"]]
+    state.rng.shuffle(state.pending_approvals)
+    state.areas = [area["_id"] for area in (await client.get("/areas/", params={"status": "active"}, headers=state.headers)).json()]
+    state.hazards = [hazard["_id"] for hazard in (await client.get("/chemicals/hazards/", headers=state.headers)).json()]
+    state.ppes = [ppe["_id"] for ppe in (await client.get("/chemicals/ppes/", headers=state.headers)).json()]
+    if not state.chemicals or not state.areas:
+        raise RuntimeError("La base de datos no tiene sustancias químicas o áreas activas; cárguelas con python -m benchmarks.dataset")
+
+async def worker(client: httpx.AsyncClient, state: LoadState, weights: dict, credentials: dict, deadline: float)->None:
+    names, values = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        operation = operations[state.rng.choices(names, values)[0]]
+        start = time.perf_counter()
+        try:
+            route, response = await operation(client, state, credentials)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            route, ok = "error de conexión", False
+        state.record(route, time.perf_counter() - start, ok)
+
+def summarize(durations: list[float], errors: int, elapsed: float)->dict:
+    durations = sorted(durations)
+    return {
+        "requests": len(durations),
+        "errors": errors,
+        "rps": round(len(durations) / elapsed, 2),
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(durations) * 1000, 2),
+    }
+
+def report(state: LoadState, elapsed: float)->dict:
+    """
+    Throughput, errores y percentiles de latencia en milisegundos por ruta y en total.
+    """
+    rows = {route: summarize(durations, state.errors.get(route, 0), elapsed) for route, durations in sorted(state.latencies.items())}
+    if rows:
+        rows["total"] = summarize([duration for durations in state.latencies.values() for duration in durations], sum(state.errors.values()), elapsed)
+    return rows
+
+async def run(args)->dict:
+    weights = parse_mix(args.mix)
+    credentials = {"username": args.username, "password": args.password}
+    state = LoadState(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        await prepare(client, state, credentials)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[worker(client, state, weights, credentials, deadline) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+    return report(state, elapsed)
+
+def main()->None:
+    parser = argparse.ArgumentParser(description="Prueba de carga con una mezcla de operaciones")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--concurrency", type=int, default=16, help="Solicitudes simultáneas")
+    parser.add_argument("--mix", default=default_mix, help=f"Pesos de las operaciones {', '.join(operations)}")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--json", default=None, help="Archivo donde guardar el reporte")
+    args = parser.parse_args()
+    try:
+        rows = asyncio.run(run(args))
+    except (ValueError, RuntimeError, httpx.HTTPError) as error:
+        sys.exit(str(error))
+
+    print(f"{'ruta':<32} {'req':>7} {'err':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, row in rows.items():
+        print(f"{route:<32} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8.1f} {row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"args": vars(args), "routes": rows}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
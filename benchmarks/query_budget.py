@@ -0,0 +1,186 @@
+"""
+Ejecuta cada ruta de chemicals, areas, users y search contra un mongod local con un conjunto de datos sintético y registra,
+por solicitud, los comandos de Mongo y la duración que reporta RequestInstrumentationMiddleware.
+Falla si una ruta envía más comandos que su presupuesto (budget) o si su mediana supera la línea base de latencia guardada.
+
+Uso: python -m benchmarks.query_budget [--mongo-url URL] [--database NOMBRE] [--chemicals N] [--areas N] [--users N]
+                                       [--repeat N] [--tolerance X] [--save-baseline] [--only TEXTO]
+La base de datos indicada se elimina y se vuelve a crear; por defecto es ChemApp_Benchmark en mongodb://localhost:27017.
+"""
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+import statistics
+import sys
+
+baseline_path = Path(__file__).with_name("latency_baseline.json")
+
+# Presupuesto de comandos de Mongo por solicitud con el volumen por defecto, incluidos los getMore de los cursores largos.
+# Las listas de hazards, ppes y roles se sirven desde el catálogo en memoria y no deben consultar la base de datos; la búsqueda en hazards sí lo hace.
+def scenarios(ids: dict)->list[dict]:
+    chemical, area, user = ids["chemicals"][0], ids["areas"][0], ids["users"][1]
+    return [
+        {"name": "GET /chemicals/", "budget": 5, "request": lambda i: ("GET", "/chemicals/", {"params": {"limit": 50}})},
+        {"name": "GET /chemicals/ aggregation", "budget": 4, "request": lambda i: ("GET", "/chemicals/", {"params": {"limit": 50, "engine": "aggregation"}})},
+        {"name": "GET /chemicals/ cursor", "budget": 5, "request": lambda i: ("GET", "/chemicals/", {"params": {"limit": 50, "pagination": "cursor"}})},
+        {"name": "GET /chemicals/ ndjson", "budget": 60, "request": lambda i: ("GET", "/chemicals/", {"params": {"response_format": "ndjson"}})},
+        {"name": "GET /chemicals/{id}", "budget": 5, "request": lambda i: ("GET", f"/chemicals/{chemical}", {})},
+        {"name": "GET /chemicals/areas/{id}", "budget": 2, "request": lambda i: ("GET", f"/chemicals/areas/{chemical}", {})},
+        {"name": "GET /chemicals/hazards/", "budget": 0, "request": lambda i: ("GET", "/chemicals/hazards/", {})},
+        {"name": "GET /chemicals/hazards/{id}", "budget": 0, "request": lambda i: ("GET", f"/chemicals/hazards/{ids['hazards'][0]}", {})},
+        {"name": "GET /chemicals/ppes/", "budget": 0, "request": lambda i: ("GET", "/chemicals/ppes/", {})},
+        {"name": "GET /chemicals/ppes/{id}", "budget": 0, "request": lambda i: ("GET", f"/chemicals/ppes/{ids['ppes'][0]}", {})},
+        {"name": "POST /chemicals/", "budget": 3, "request": lambda i: ("POST", "/chemicals/", {"json": new_chemical(ids, f"benchmark {i}")})},
+        {"name": "POST /chemicals/bulk/", "budget": 2, "request": lambda i: ("POST", "/chemicals/bulk/", {"json": [new_chemical(ids, f"bulk {i} {row}") for row in range(20)]})},
+        {"name": "POST /chemicals/bulk/upload/", "budget": 2, "request": lambda i: ("POST", "/chemicals/bulk/upload/", {"files": {"file": (
+            "chemicals.ndjson", "\n".join(json.dumps(new_chemical(ids, f"upload {i} {row}")) for row in range(20)), "application/x-ndjson")}})},
+        {"name": "PUT /chemicals/{id}", "budget": 3, "request": lambda i: ("PUT", f"/chemicals/{ids['chemicals'][i + 1]}", {"json": {"providers": ["Proveedor Benchmark"]}})},
+        {"name": "PATCH /chemicals/approval/{id}", "budget": 4, "request": lambda i: ("PATCH", f"/chemicals/approval/{ids['unapproved_chemicals'][i]}", {"params": {"approval_type": "ems"}})},
+        {"name": "DELETE /chemicals/{id}", "budget": 4, "request": lambda i: ("DELETE", f"/chemicals/{ids['chemicals'][-(i + 1)]}", {})},
+        {"name": "GET /areas/", "budget": 8, "request": lambda i: ("GET", "/areas/", {"params": {"limit": 20}})},
+        {"name": "GET /areas/{id}", "budget": 7, "request": lambda i: ("GET", f"/areas/{area}", {})},
+        {"name": "POST /areas/", "budget": 6, "request": lambda i: ("POST", "/areas/", {"json": {"area": f"area benchmark {i}", "chemicals": ids["chemicals"][:20]}})},
+        {"name": "PUT /areas/{id}", "budget": 6, "request": lambda i: ("PUT", f"/areas/{ids['areas'][i + 1]}", {"json": {"chemicals": ids["chemicals"][i:i + 20]}})},
+        {"name": "DELETE /areas/{id}", "budget": 5, "request": lambda i: ("DELETE", f"/areas/{ids['areas'][-(i + 1)]}", {})},
+        {"name": "GET /users/", "budget": 7, "request": lambda i: ("GET", "/users/", {"params": {"limit": 50}})},
+        {"name": "GET /users/{id}", "budget": 7, "request": lambda i: ("GET", f"/users/{user}", {})},
+        {"name": "POST /users/", "budget": 6, "request": lambda i: ("POST", "/users/", {"json": {
+            "firstname": "benchmark", "lastname": "user", "email": f"benchmark{i}@benchmark.com", "username": f"benchmark{i}",
+            "password": "benchmark", "areas": ids["areas"][:2], "role": ids["roles"][1]}})},
+        {"name": "PUT /users/{id}", "budget": 4, "request": lambda i: ("PUT", f"/users/{ids['users'][i + 2]}", {"json": {"firstname": f"benchmark {i}"}})},
+        {"name": "DELETE /users/{id}", "budget": 4, "request": lambda i: ("DELETE", f"/users/{ids['users'][-(i + 1)]}", {})},
+        {"name": "POST /users/login", "budget": 1, "auth": False, "request": lambda i: ("POST", "/users/login", {"data": {"username": "admin", "password": "benchmark"}})},
+        {"name": "GET /users/active_user/", "budget": 0, "request": lambda i: ("GET", "/users/active_user/", {})},
+        {"name": "GET /users/roles/", "budget": 0, "request": lambda i: ("GET", "/users/roles/", {})},
+        {"name": "GET /users/roles/{id}", "budget": 0, "request": lambda i: ("GET", f"/users/roles/{ids['roles'][0]}", {})},
+        {"name": "GET /users/caches/", "budget": 0, "request": lambda i: ("GET", "/users/caches/", {})},
+        {"name": "POST /users/catalogs/reload/", "budget": 4, "request": lambda i: ("POST", "/users/catalogs/reload/", {})},
+        {"name": "GET /search/ chemicals", "budget": 2, "request": lambda i: ("GET", "/search/", {"params": {"collection_name": "chemicals", "search_query": "acido", "limit": 50}})},
+        {"name": "GET /search/ chemicals relevance", "budget": 2, "request": lambda i: ("GET", "/search/", {"params": {"collection_name": "chemicals", "search_query": "acido", "limit": 50, "relevance": True}})},
+        {"name": "GET /search/ areas", "budget": 4, "request": lambda i: ("GET", "/search/", {"params": {"collection_name": "areas", "search_query": "bodega"}})},
+        {"name": "GET /search/ users", "budget": 4, "request": lambda i: ("GET", "/search/", {"params": {"collection_name": "users", "search_query": "a", "limit": 50}})},
+        {"name": "GET /search/ hazards", "budget": 1, "request": lambda i: ("GET", "/search/", {"params": {"collection_name": "hazards", "search_query": "infla"}})},
+    ]
+
+def new_chemical(ids: dict, name: str)->dict:
+    return {
+        "chemical": f"sustancia {name}",
+        "hazards": ids["hazards"][:3],
+        "ppes": ids["ppes"][:2],
+        "providers": ["proveedor benchmark"],
+        "p_phrases": [{"code": "P280", "description": "Llevar guantes, prendas, gafas y máscara de protección."}],
+        "h_phrases": [{"code": "H225", "description": "Líquido y vapores muy inflamables."}],
+    }
+
+def dataset_ids(dataset: dict)->dict:
+    """
+    MongoID de los documentos activos de cada colección que usan los escenarios.
+    """
+    ids = {name: [str(document["_id"]) for document in documents if document.get("status", True)] for name, documents in dataset.items()}
+    ids["unapproved_chemicals"] = [str(chemical["_id"]) for chemical in dataset["chemicals"] if chemical["status"] and not chemical["ems"]["approval"]]
+    return ids
+
+class RequestLogCapture(logging.Handler):
+    """
+    Guarda la última línea de log de RequestInstrumentationMiddleware, con los comandos y la duración de la solicitud.
+    """
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.last = None
+
+    def emit(self, record: logging.LogRecord)->None:
+        self.last = json.loads(record.getMessage())
+
+def run_scenario(client, headers: dict, capture: RequestLogCapture, scenario: dict, repeat: int)->dict:
+    """
+    Ejecuta la solicitud del escenario una vez para calentar y luego repeat veces. Retorna el máximo de comandos y las duraciones del servidor.
+    """
+    commands, durations = [], []
+    for i in range(repeat + 1):
+        method, path, kwargs = scenario["request"](i)
+        response = client.request(method, path, headers=headers if scenario.get("auth", True) else None, **kwargs)
+        if response.status_code >= 400:
+            return {"error": f"{response.status_code} {response.text[:200]}"}
+        if i > 0:
+            commands.append(capture.last["db"]["commands"])
+            durations.append(capture.last["duration_ms"])
+    return {"commands": max(commands), "median_ms": statistics.median(durations), "max_ms": max(durations)}
+
+def main()->None:
+    parser = argparse.ArgumentParser(description="Presupuesto de consultas y línea base de latencia por ruta")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017/?directConnection=true")
+    parser.add_argument("--database", default="ChemApp_Benchmark")
+    parser.add_argument("--chemicals", type=int, default=2000)
+    parser.add_argument("--areas", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Factor sobre la mediana de la línea base a partir del cual una ruta falla")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda las medianas medidas como línea base de latencia")
+    parser.add_argument("--only", default=None, help="Ejecuta solo los escenarios cuyo nombre contiene el texto")
+    args = parser.parse_args()
+    if args.database == "ChemApp_DB":
+        sys.exit("La base de datos del benchmark se elimina antes de cargar los datos; use una distinta a ChemApp_DB")
+
+    # La configuración se lee al importar la aplicación: se apunta al mongod local y se desactiva la caché de respuestas para medir cada consulta.
+    os.environ.update(
+        CONNECTION_STRING=args.mongo_url,
+        MONGO_DATABASE=args.database,
+        MONGO_TLS="false",
+        CHANGE_STREAMS_ENABLED="false",
+        RESPONSE_CACHE_MAXSIZE="0",
+    )
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+
+    from fastapi.testclient import TestClient
+    from app.core.catalog import load_catalogs
+    from app.main import app
+    from benchmarks.dataset import generate_dataset, load_dataset
+
+    capture = RequestLogCapture()
+    request_logger = logging.getLogger("app.core.instrumentation")
+    request_logger.setLevel(logging.INFO)
+    request_logger.addHandler(capture)
+    request_logger.propagate = False
+
+    dataset = generate_dataset(args.chemicals, args.areas, args.users)
+    ids = dataset_ids(dataset)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    measured, failures = {}, []
+
+    with TestClient(app) as client:
+        client.portal.call(load_dataset, dataset)
+        client.portal.call(load_catalogs)
+        token = client.post("/users/login", data={"username": "admin", "password": "benchmark"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print(f"{'ruta':<36} {'comandos':>8} {'budget':>6} {'mediana':>9} {'base':>9}")
+        for scenario in scenarios(ids):
+            if args.only and args.only not in scenario["name"]:
+                continue
+            result = run_scenario(client, headers, capture, scenario, args.repeat)
+            if "error" in result:
+                failures.append(f"{scenario['name']}: {result['error']}")
+                print(f"{scenario['name']:<36} error {result['error']}")
+                continue
+            measured[scenario["name"]] = round(result["median_ms"], 3)
+            base = baseline.get(scenario["name"])
+            print(f"{scenario['name']:<36} {result['commands']:>8} {scenario['budget']:>6} {result['median_ms']:>8.1f}ms {f'{base:.1f}ms' if base else '-':>9}")
+            if result["commands"] > scenario["budget"]:
+                failures.append(f"{scenario['name']}: {result['commands']} comandos, presupuesto {scenario['budget']}")
+            # Se suman 5 ms a la tolerancia para que las rutas de pocos milisegundos no fallen por ruido.
+            if base and not args.save_baseline and result["median_ms"] > base * args.tolerance + 5:
+                failures.append(f"{scenario['name']}: mediana {result['median_ms']:.1f} ms, línea base {base:.1f} ms")
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps({**baseline, **measured}, indent=2, sort_keys=True) + "\n")
+        print(f"línea base guardada en {baseline_path}")
+    if failures:
+        print("\n".join(["", "Fallas:", *failures]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compara la serialización de FastAPI (validación con el response_model y json estándar) con la ruta rápida de app.helpers.serialization.
+
+Uso: python -m benchmarks.serialization [cantidad_de_documentos] [repeticiones]
+Requiere las mismas variables de entorno que la aplicación.
+"""
+import asyncio
+from datetime import datetime, timedelta
+import json
+import random
+import sys
+import time
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.helpers.serialization import fast_json_response
+from app.models.chemical import ChemicalRead
+
+def synthetic_chemicals(count: int)->list[dict]:
+    """
+    Genera sustancias químicas pobladas como las retorna la capa de lectura, con los textos ya normalizados como al guardarlos.
+    """
+    random.seed(0)
+    hazards = [dict(hazard, _id=ObjectId()) for hazard in json.load(open("app/static/hazards.json", encoding="utf-8"))]
+    ppes = [dict(ppe, _id=ObjectId()) for ppe in json.load(open("app/static/ppe.json", encoding="utf-8"))]
+    user = {"_id": ObjectId(), "firstname": "Ana", "lastname": "Perez", "email": "ana@mail.com", "username": "ana"}
+    now = datetime(2024, 1, 1, 12, 0, 0, 123000)
+    chemicals = []
+    for index in range(count):
+        approved = index % 2 == 0
+        approval = {"approval": approved, "approbed_by": user if approved else None, "approval_date": now if approved else None}
+        chemicals.append({
+            "_id": ObjectId(),
+            "chemical": f"Sustancia Quimica {index}",
+            "hazards": random.sample(hazards, 3),
+            "ppes": random.sample(ppes, 2),
+            "providers": ["Proveedor Uno", "Proveedor Dos"],
+            "manufacturers": ["Fabricante"],
+            "p_phrases": [{"code": "P101", "description": "Si se necesita consultar a un médico, tener a mano el recipiente o la etiqueta."}],
+            "h_phrases": [{"code": "H200", "description": "Explosivo inestable."}],
+            "sds": ["Https://Example.Com/Sds.Pdf"],
+            "fsms": approval, "ems": approval, "ohsms": approval,
+            "last_update_by": user,
+            "last_update_date": now + timedelta(seconds=index),
+            "status": True,
+            "search_chemical": [f"sustancia quimica {index}"],
+        })
+    return chemicals
+
+async def fastapi_path(documents: list[dict])->bytes:
+    field = create_response_field(name="Response", type_=list[ChemicalRead])
+    content = await serialize_response(field=field, response_content=documents)
+    return JSONResponse(content).body
+
+def fast_path(documents: list[dict])->bytes:
+    return fast_json_response(documents, ChemicalRead).body
+
+def timed(function, repetitions: int)->float:
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
+
+def main(count: int = 1000, repetitions: int = 20)->None:
+    documents = synthetic_chemicals(count)
+    loop = asyncio.new_event_loop()
+    slow_body = loop.run_until_complete(fastapi_path(documents))
+    fast_body = fast_path(documents)
+    if slow_body != fast_body:
+        sys.exit("Las dos rutas no producen el mismo JSON")
+
+    slow = timed(lambda: loop.run_until_complete(fastapi_path(documents)), repetitions)
+    fast = timed(lambda: fast_path(documents), repetitions)
+    print(f"{count} documentos, {len(fast_body)} bytes, {repetitions} repeticiones")
+    print(f"response_model + json: {slow * 1000:8.2f} ms")
+    print(f"forma + orjson:        {fast * 1000:8.2f} ms  ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))